@@ -1,24 +1,56 @@
-from typing import Generator, Optional
-from fastapi import Depends, HTTPException, status
+from typing import Dict, Generator, Optional, Tuple
+from fastapi import Depends, HTTPException, Response, status
+from fastapi.requests import HTTPConnection
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from motor.motor_asyncio import AsyncIOMotorDatabase
-import uuid
+from jose import jwt
+from types import MappingProxyType
+import asyncio
+import logging
+import math
+import secrets
+import time
 
-from app.core.database import get_database
-from app.core.security import verify_token, AuthenticationError
+from app.core import rate_limit, token_cache
+from app.core.config import settings
+from app.core.security import AuthenticationError
 from app.models.user import User
 from app.services.auth_service import AuthService
 from app.services.chat_service import EnhancedChatService  # Fixed import
 from app.services.ai_service import AIService
 from app.schemas.common import PaginationParams
 
-# Security scheme
+logger = logging.getLogger(__name__)
+
+# Security schemes
 security = HTTPBearer()
+security_optional = HTTPBearer(auto_error=False)
+
+# Subscription tier hierarchy and admin accounts (built once at import)
+_TIER_LEVEL = MappingProxyType({
+    "free": 0,
+    "premium": 1,
+    "professional": 2
+})
+_ADMIN_EMAILS = frozenset(email.lower() for email in settings.ADMIN_EMAILS)
 
 # Database dependency
-async def get_db() -> AsyncIOMotorDatabase:
-    """Get database dependency"""
-    return await get_database()
+def get_db(conn: HTTPConnection) -> AsyncIOMotorDatabase:
+    """Get database dependency (handle is created once in lifespan)"""
+    return conn.app.state.db
+
+# Service dependencies (app-scoped instances created in lifespan)
+def get_auth_service(conn: HTTPConnection) -> AuthService:
+    """Get authentication service"""
+    return conn.app.state.auth_service
+
+def get_chat_service(conn: HTTPConnection) -> EnhancedChatService:
+    """Get chat service"""
+    return conn.app.state.chat_service
+
+def get_ai_service(conn: HTTPConnection) -> AIService:
+    """Get AI service"""
+    return conn.app.state.ai_service
 
 # Authentication dependencies
 async def get_current_user_token(
@@ -34,18 +66,41 @@ async def get_current_user_token(
     
     return token
 
-async def get_current_user(
-    token: str = Depends(get_current_user_token),
-    db: AsyncIOMotorDatabase = Depends(get_db)
-) -> User:
-    """Get current authenticated user"""
-    auth_service = AuthService(db)
-    return await auth_service.get_current_user(token)
+async def _resolve_user(token: str, auth_service: AuthService) -> User:
+    """Load the user for a token, served from the token cache when possible"""
+    key = token_cache.token_key(token)
+    user, negative = await token_cache.lookup(key)
+    if user is not None:
+        return user
+    if negative:
+        raise AuthenticationError("Invalid access token")
+
+    return await _load_user(key, token, auth_service)
+
+async def _load_user(key: bytes, token: str, auth_service: AuthService) -> User:
+    """Cache miss: load the user from Mongo and populate both cache tiers"""
+    try:
+        user = await auth_service.get_current_user(token)
+    except HTTPException as e:
+        # Only "user not found" is remembered; inactive accounts keep their own 400
+        if e.status_code == status.HTTP_401_UNAUTHORIZED:
+            await token_cache.store_negative(key)
+        raise
+
+    # Token was verified above, so its claims can be read without re-checking the signature
+    token_exp = jwt.get_unverified_claims(token).get("exp", 0)
+    await token_cache.store(key, user, token_exp)
+    return user
 
-async def get_current_active_user(
-    current_user: User = Depends(get_current_user)
+async def authenticated_active_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    auth_service: AuthService = Depends(get_auth_service)
 ) -> User:
-    """Get current active user"""
+    """Extract bearer token, load the user and require an active account in one dependency"""
+    if not credentials or not credentials.credentials:
+        raise AuthenticationError("Token required")
+
+    current_user = await _resolve_user(credentials.credentials, auth_service)
     if not current_user.is_active:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -53,45 +108,42 @@ async def get_current_active_user(
         )
     return current_user
 
+async def get_current_user(
+    token: str = Depends(get_current_user_token),
+    auth_service: AuthService = Depends(get_auth_service)
+) -> User:
+    """Get current authenticated user"""
+    return await _resolve_user(token, auth_service)
+
+# Kept for existing routes; resolves through the fused dependency
+get_current_active_user = authenticated_active_user
+
 # Optional authentication (for public endpoints that can benefit from user context)
+def maybe_token(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security_optional)
+) -> Optional[str]:
+    """Bearer token if one was sent; only inspects the header"""
+    return credentials.credentials if credentials else None
+
 async def get_current_user_optional(
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False)),
-    db: AsyncIOMotorDatabase = Depends(get_db)
+    token: Optional[str] = Depends(maybe_token),
+    auth_service: AuthService = Depends(get_auth_service)
 ) -> Optional[User]:
     """Get current user if authenticated, None otherwise"""
-    if not credentials:
+    if token is None:
         return None
     
     try:
-        token = credentials.credentials
-        auth_service = AuthService(db)
-        return await auth_service.get_current_user(token)
-    except Exception:
+        return await _resolve_user(token, auth_service)
+    except HTTPException:
+        # Invalid/expired token or inactive user; infrastructure errors propagate
         return None
 
-# Service dependencies
-async def get_auth_service(
-    db: AsyncIOMotorDatabase = Depends(get_db)
-) -> AuthService:
-    """Get authentication service"""
-    return AuthService(db)
-
-async def get_chat_service(
-    db: AsyncIOMotorDatabase = Depends(get_db)
-) -> EnhancedChatService:  # Fixed return type
-    """Get chat service"""
-    return EnhancedChatService(db)
-
-async def get_ai_service(
-    db: AsyncIOMotorDatabase = Depends(get_db)
-) -> AIService:
-    """Get AI service"""
-    return AIService(db)
-
 # Pagination dependency
 def get_pagination_params(
     page: int = 1,
-    size: int = 20
+    size: int = 20,
+    after: Optional[str] = None
 ) -> PaginationParams:
     """Get pagination parameters with validation"""
     if page < 1:
@@ -101,88 +153,86 @@ def get_pagination_params(
     if size > 100:  # Maximum page size
         size = 100
     
-    return PaginationParams(page=page, size=size)
+    return PaginationParams(page=page, size=size, after=after)
 
 # WebSocket connection ID generator
 def generate_connection_id() -> str:
     """Generate unique connection ID for WebSocket"""
-    return str(uuid.uuid4())
+    return secrets.token_urlsafe(16)
 
-# Rate limiting dependency (basic implementation)
-class RateLimiter:
-    def __init__(self, requests_per_minute: int = 60):
-        self.requests_per_minute = requests_per_minute
-        self.requests: dict = {}
-    
-    def is_allowed(self, key: str) -> bool:
-        """Check if request is allowed based on rate limit"""
-        import time
-        current_time = time.time()
-        minute_window = int(current_time // 60)
-        
-        if key not in self.requests:
-            self.requests[key] = {}
-        
-        # Clean old windows
-        self.requests[key] = {
-            window: count for window, count in self.requests[key].items()
-            if window >= minute_window - 1
-        }
-        
-        # Count requests in current window
-        current_requests = self.requests[key].get(minute_window, 0)
-        
-        if current_requests >= self.requests_per_minute:
-            return False
-        
-        # Increment counter
-        self.requests[key][minute_window] = current_requests + 1
-        return True
+# Rate limiting dependencies (in-process token bucket, reconciled through Redis)
+GENERAL_RATE_LIMIT_PER_MINUTE = 60
+AI_RATE_LIMIT_PER_MINUTE = 20  # More restrictive for AI endpoints
 
-# Global rate limiter instances
-general_rate_limiter = RateLimiter(requests_per_minute=60)
-ai_rate_limiter = RateLimiter(requests_per_minute=20)  # More restrictive for AI endpoints
-
-async def check_general_rate_limit(
-    current_user: User = Depends(get_current_active_user)
+def enforce_rate_limit(
+    user: User,
+    response: Response,
+    key_prefix: str,
+    limit: int,
+    window_s: int,
+    detail: str
 ):
-    """Check general rate limit for authenticated endpoints"""
-    user_key = str(current_user.id)
-    
-    if not general_rate_limiter.is_allowed(user_key):
+    """Charge one request to a user's bucket, raising 429 when it is empty"""
+    # Local decision; no network round-trip on the request path
+    key = f"{key_prefix}{user.id}"
+    if not rate_limit.check(key, limit, window_s):
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail="Rate limit exceeded. Please try again later."
+            detail=detail,
+            headers={
+                "X-RateLimit-Limit": str(limit),
+                "X-RateLimit-Remaining": "0",
+                # One token refills every window_s / limit seconds
+                "Retry-After": str(math.ceil(window_s / limit))
+            }
         )
 
+    response.headers["X-RateLimit-Limit"] = str(limit)
+    response.headers["X-RateLimit-Remaining"] = str(rate_limit.remaining(key, window_s))
+
+def enforce_general_rate_limit(user: User, response: Response):
+    """Charge the general bucket"""
+    enforce_rate_limit(
+        user, response, "rl:", GENERAL_RATE_LIMIT_PER_MINUTE, 60,
+        "Rate limit exceeded. Please try again later."
+    )
+
+def enforce_ai_rate_limit(user: User, response: Response):
+    """Charge the AI bucket (more restrictive)"""
+    enforce_rate_limit(
+        user, response, "rl:ai:", AI_RATE_LIMIT_PER_MINUTE, 60,
+        "AI request limit exceeded. Please try again later."
+    )
+
+async def check_general_rate_limit(
+    response: Response,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    auth_service: AuthService = Depends(get_auth_service)
+) -> User:
+    """Check general rate limit for authenticated endpoints"""
+    current_user = await authenticated_active_user(credentials, auth_service)
+    enforce_general_rate_limit(current_user, response)
+    return current_user
+
 async def check_ai_rate_limit(
-    current_user: User = Depends(get_current_active_user)
-):
+    response: Response,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    auth_service: AuthService = Depends(get_auth_service)
+) -> User:
     """Check AI-specific rate limit"""
-    user_key = f"ai_{current_user.id}"
-    
-    if not ai_rate_limiter.is_allowed(user_key):
-        raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail="AI request limit exceeded. Please try again later."
-        )
+    current_user = await authenticated_active_user(credentials, auth_service)
+    enforce_ai_rate_limit(current_user, response)
+    return current_user
 
 # Subscription tier dependency
 def require_subscription_tier(required_tier: str):
     """Dependency factory to require specific subscription tier"""
+    required_tier_level = _TIER_LEVEL.get(required_tier, 0)
     
     async def check_subscription(
-        current_user: User = Depends(get_current_active_user)
+        current_user: User = Depends(authenticated_active_user)
     ):
-        # Define tier hierarchy
-        tier_hierarchy = {
-            "free": 0,
-            "premium": 1,
-            "professional": 2
-        }
-        
-        user_tier_level = tier_hierarchy.get(current_user.subscription.tier, 0)
-        required_tier_level = tier_hierarchy.get(required_tier, 0)
+        user_tier_level = _TIER_LEVEL.get(current_user.subscription.tier, 0)
         
         if user_tier_level < required_tier_level:
             raise HTTPException(
@@ -196,14 +246,12 @@ def require_subscription_tier(required_tier: str):
 
 # Admin user dependency
 async def get_admin_user(
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(authenticated_active_user)
 ) -> User:
     """Require admin privileges"""
     # This would typically check a role field or admin flag
     # For now, we'll use email-based admin check
-    admin_emails = ["admin@lawbuddy.com", "support@lawbuddy.com"]
-    
-    if current_user.email not in admin_emails:
+    if current_user.email.lower() not in _ADMIN_EMAILS:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admin privileges required"
@@ -214,7 +262,7 @@ async def get_admin_user(
 # Chat ownership dependency
 async def verify_chat_ownership(
     chat_id: str,
-    current_user: User = Depends(get_current_active_user),
+    current_user: User = Depends(authenticated_active_user),
     chat_service: EnhancedChatService = Depends(get_chat_service)  # Fixed type
 ):
     """Verify that the current user owns the specified chat"""
@@ -249,32 +297,71 @@ class FeatureFlags:
     FILE_UPLOADS = False
 
 def require_feature_flag(feature_name: str):
-    """Dependency factory to require feature flag"""
+    """Dependency factory to require feature flag (resolved once at route definition)"""
+    feature_enabled = getattr(FeatureFlags, feature_name, False)
     
-    async def check_feature():
-        feature_enabled = getattr(FeatureFlags, feature_name, False)
-        
-        if not feature_enabled:
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail=f"Feature '{feature_name}' is currently disabled"
-            )
+    async def feature_enabled_check():
+        return None
     
-    return check_feature
+    async def feature_disabled_check():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Feature '{feature_name}' is currently disabled"
+        )
+    
+    return feature_enabled_check if feature_enabled else feature_disabled_check
 
 # Health check dependencies
+# Probe results are reused for a short window so frequent liveness/readiness
+# probes collapse into one database ping per window.
+HEALTH_CACHE_TTL_SECONDS = 2.0
+_health_cache: Dict[str, Tuple[float, bool]] = {}
+_health_lock = asyncio.Lock()
+# Error from the latest database probe, kept so health endpoints can report it
+_database_health_error: Optional[str] = None
+
+def _cached_health(name: str) -> Optional[bool]:
+    cached = _health_cache.get(name)
+    if cached is not None and time.monotonic() - cached[0] < HEALTH_CACHE_TTL_SECONDS:
+        return cached[1]
+    return None
+
 async def check_database_health(
     db: AsyncIOMotorDatabase = Depends(get_db)
 ) -> bool:
     """Check if database is healthy"""
-    try:
-        await db.command("ping")
-        return True
-    except Exception:
-        return False
+    global _database_health_error
+    healthy = _cached_health("db")
+    if healthy is not None:
+        return healthy
+
+    # Single-flight: concurrent probes wait for the one ping in progress
+    async with _health_lock:
+        healthy = _cached_health("db")
+        if healthy is not None:
+            return healthy
+
+        try:
+            await db.command("ping")
+            healthy = True
+            _database_health_error = None
+        except Exception as e:
+            healthy = False
+            _database_health_error = str(e)
+
+        _health_cache["db"] = (time.monotonic(), healthy)
+        return healthy
+
+def database_health_error() -> Optional[str]:
+    """Why the latest database probe failed; None if it succeeded"""
+    return _database_health_error
 
 async def check_ai_service_health(
     ai_service: AIService = Depends(get_ai_service)
 ) -> bool:
     """Check if AI service is healthy"""
-    return ai_service.is_available()
\ No newline at end of file
+    healthy = _cached_health("ai")
+    if healthy is None:
+        healthy = ai_service.is_available()
+        _health_cache["ai"] = (time.monotonic(), healthy)
+    return healthy
@@ -1,16 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from collections import OrderedDict
+from typing import Tuple
+from fastapi import APIRouter, Depends, Response, status
+from fastapi.responses import ORJSONResponse
 from fastapi.security import HTTPAuthorizationCredentials
 from motor.motor_asyncio import AsyncIOMotorDatabase
+import orjson
 
-from app.api.deps import get_db, get_auth_service, get_current_user, security
+from app.api.deps import get_db, get_auth_service, authenticated_active_user, security
+from app.core.token_cache import invalidate_token, invalidate_user
 from app.services.auth_service import AuthService
-from app.schemas.auth import UserRegister, UserLogin, Token, TokenRefresh, PasswordReset, PasswordResetConfirm
+from app.schemas.auth import UserRegister, UserLogin, Token, TokenRefresh, PasswordReset, PasswordResetConfirm, PasswordChange
 from app.schemas.user import UserResponse
 from app.schemas.common import SuccessResponse, ErrorResponse
 from app.models.user import User
 
 router = APIRouter()
 
+# Pre-encoded /me bodies: {user_id: (updated_at version, json bytes)}, least recently used first
+ME_CACHE_MAX_ENTRIES = 10_000
+_me_cache: "OrderedDict[str, Tuple[str, bytes]]" = OrderedDict()
+
+def _evict_me_cache(user_id: str):
+    _me_cache.pop(user_id, None)
+
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def register_user(
     user_data: UserRegister,
@@ -23,33 +35,20 @@ async def register_user(
     - **password**: User's password (minimum 8 characters with complexity requirements)
     - **full_name**: User's full name (optional)
     """
-    try:
-        user = await auth_service.register_user(user_data)
-        
-        return UserResponse(
-            id=str(user.id),
-            email=user.email,
-            profile=user.profile,
-            preferences=user.preferences,
-            subscription=user.subscription.dict(),
-            usage_stats=user.usage_stats.dict(),
-            is_active=user.is_active,
-            created_at=user.created_at.isoformat()
-        )
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="An error occurred during registration"
-        )
+    user = await auth_service.register_user(user_data)
+    
+    # Returning the response directly skips FastAPI's response_model re-validation
+    return ORJSONResponse(
+        content=UserResponse.from_user(user).model_dump(mode="json"),
+        status_code=status.HTTP_201_CREATED
+    )
 
-@router.post("/login", response_model=Token)
+# response_model=None: the service already returns a validated Token
+@router.post("/login", response_model=None, responses={200: {"model": Token}})
 async def login_user(
     login_data: UserLogin,
     auth_service: AuthService = Depends(get_auth_service)
-):
+) -> Token:
     """
     Authenticate user and return access tokens
     
@@ -58,23 +57,14 @@ async def login_user(
     
     Returns access token and refresh token for subsequent API calls.
     """
-    try:
-        token = await auth_service.login_user(login_data)
-        return token
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="An error occurred during login"
-        )
+    return await auth_service.login_user(login_data)
 
-@router.post("/refresh", response_model=Token)
+# response_model=None: the service already returns a validated Token
+@router.post("/refresh", response_model=None, responses={200: {"model": Token}})
 async def refresh_access_token(
     refresh_data: TokenRefresh,
     auth_service: AuthService = Depends(get_auth_service)
-):
+) -> Token:
     """
     Refresh access token using refresh token
     
@@ -82,22 +72,12 @@ async def refresh_access_token(
     
     Returns new access token and refresh token.
     """
-    try:
-        token = await auth_service.refresh_token(refresh_data.refresh_token)
-        return token
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="An error occurred during token refresh"
-        )
+    return await auth_service.refresh_token(refresh_data.refresh_token)
 
 @router.post("/logout", response_model=SuccessResponse)
 async def logout_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(authenticated_active_user)
 ):
     """
     Logout user (invalidate current session)
@@ -107,55 +87,44 @@ async def logout_user(
     - Clear any server-side session data
     - Notify other services of the logout
     """
-    try:
-        # In a real implementation, you would:
-        # 1. Add token to blacklist/revocation list
-        # 2. Clear any cached user data
-        # 3. Log the logout event
-        
-        return SuccessResponse(
-            message="Successfully logged out",
-            data={"user_id": str(current_user.id)}
-        )
-        
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="An error occurred during logout"
-        )
+    # In a real implementation, you would:
+    # 1. Add token to blacklist/revocation list
+    # 2. Log the logout event
+    await invalidate_token(credentials.credentials)
+    
+    return SuccessResponse(
+        message="Successfully logged out",
+        data={"user_id": str(current_user.id)}
+    )
 
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_info(
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(authenticated_active_user)
 ):
     """
     Get current authenticated user's information
     
     Returns detailed user profile, preferences, and usage statistics.
     """
-    try:
-        return UserResponse(
-            id=str(current_user.id),
-            email=current_user.email,
-            profile=current_user.profile,
-            preferences=current_user.preferences,
-            subscription=current_user.subscription.dict(),
-            usage_stats=current_user.usage_stats.dict(),
-            is_active=current_user.is_active,
-            created_at=current_user.created_at.isoformat()
-        )
-        
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="An error occurred while fetching user information"
-        )
+    user_id = str(current_user.id)
+    version = current_user.updated_at.isoformat()
+    
+    cached = _me_cache.get(user_id)
+    if cached is not None and cached[0] == version:
+        _me_cache.move_to_end(user_id)
+        return Response(content=cached[1], media_type="application/json")
+    
+    body = orjson.dumps(UserResponse.from_user(current_user).model_dump(mode="json"))
+    _me_cache[user_id] = (version, body)
+    if len(_me_cache) > ME_CACHE_MAX_ENTRIES:
+        _me_cache.popitem(last=False)
+    
+    return Response(content=body, media_type="application/json")
 
 @router.post("/change-password", response_model=SuccessResponse)
 async def change_password(
-    current_password: str,
-    new_password: str,
-    current_user: User = Depends(get_current_user),
+    password_data: PasswordChange,
+    current_user: User = Depends(authenticated_active_user),
     auth_service: AuthService = Depends(get_auth_service)
 ):
     """
@@ -164,25 +133,18 @@ async def change_password(
     - **current_password**: User's current password
     - **new_password**: New password (must meet complexity requirements)
     """
-    try:
-        await auth_service.change_password(
-            str(current_user.id),
-            current_password,
-            new_password
-        )
-        
-        return SuccessResponse(
-            message="Password changed successfully",
-            data={"user_id": str(current_user.id)}
-        )
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="An error occurred while changing password"
-        )
+    await auth_service.change_password(
+        str(current_user.id),
+        password_data.current_password.get_secret_value(),
+        password_data.new_password.get_secret_value()
+    )
+    await invalidate_user(str(current_user.id))
+    _evict_me_cache(str(current_user.id))
+    
+    return SuccessResponse(
+        message="Password changed successfully",
+        data={"user_id": str(current_user.id)}
+    )
 
 @router.post("/forgot-password", response_model=SuccessResponse)
 async def request_password_reset(
@@ -194,28 +156,15 @@ async def request_password_reset(
     
     - **email**: User's email address
     
-    Note: This is a placeholder implementation. In production, you would:
-    - Generate a secure reset token
-    - Send email with reset link
-    - Store token with expiration
+    Note: Email delivery is not wired up yet; the reset token is generated
+    and stored (as a SHA-256 digest with expiration) but not sent.
     """
-    try:
-        # TODO: Implement actual password reset logic
-        # 1. Check if user exists
-        # 2. Generate secure reset token
-        # 3. Send reset email
-        # 4. Store token with expiration
-        
-        return SuccessResponse(
-            message="If an account with this email exists, a password reset link has been sent",
-            data={"email": reset_data.email}
-        )
-        
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="An error occurred while processing password reset request"
-        )
+    await auth_service.create_password_reset(reset_data.email)
+    
+    return SuccessResponse(
+        message="If an account with this email exists, a password reset link has been sent",
+        data={"email": reset_data.email}
+    )
 
 @router.post("/reset-password", response_model=SuccessResponse)
 async def confirm_password_reset(
@@ -228,33 +177,24 @@ async def confirm_password_reset(
     - **token**: Password reset token from email
     - **new_password**: New password
     
-    Note: This is a placeholder implementation. In production, you would:
-    - Validate the reset token
-    - Check token expiration
-    - Update user's password
-    - Invalidate the token
-    """
-    try:
-        # TODO: Implement actual password reset confirmation
-        # 1. Validate reset token
-        # 2. Check token expiration
-        # 3. Update user password
-        # 4. Invalidate token
-        
-        return SuccessResponse(
-            message="Password reset successfully",
-            data={"token_used": reset_data.token[:8] + "..."}
-        )
-        
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="An error occurred while resetting password"
-        )
+    The token is single-use and expires after PASSWORD_RESET_EXPIRE_MINUTES.
+    """
+    user_id, token_digest = await auth_service.reset_password(
+        reset_data.token,
+        reset_data.new_password
+    )
+    await invalidate_user(user_id)
+    _evict_me_cache(user_id)
+    
+    # Only a digest prefix is echoed, never any part of the secret itself
+    return SuccessResponse(
+        message="Password reset successfully",
+        data={"token_used": token_digest.hex()[:8]}
+    )
 
 @router.delete("/deactivate", response_model=SuccessResponse)
 async def deactivate_account(
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(authenticated_active_user),
     auth_service: AuthService = Depends(get_auth_service)
 ):
     """
@@ -263,16 +203,11 @@ async def deactivate_account(
     This will deactivate the account but preserve data.
     For complete account deletion, contact support.
     """
-    try:
-        await auth_service.deactivate_user(str(current_user.id))
-        
-        return SuccessResponse(
-            message="Account deactivated successfully",
-            data={"user_id": str(current_user.id)}
-        )
-        
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="An error occurred while deactivating account"
-        )
\ No newline at end of file
+    await auth_service.deactivate_user(str(current_user.id))
+    await invalidate_user(str(current_user.id))
+    _evict_me_cache(str(current_user.id))
+    
+    return SuccessResponse(
+        message="Account deactivated successfully",
+        data={"user_id": str(current_user.id)}
+    )
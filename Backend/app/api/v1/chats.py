@@ -1,18 +1,33 @@
 from bson import ObjectId
-from fastapi import APIRouter, Depends, HTTPException, status, Query, BackgroundTasks
-from typing import Optional, Dict, Any, List
+from bson.errors import InvalidId
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, status, Query, BackgroundTasks, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import Optional, Dict, Any, List, Tuple
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from datetime import datetime
+import orjson
 
 from app.api.deps import (
-    get_current_active_user,
     get_db,
+    get_chat_service,
+    get_ai_service,
     get_pagination_params,
+    authenticated_active_user,
     check_general_rate_limit,
-    check_ai_rate_limit
+    check_ai_rate_limit,
+    enforce_general_rate_limit,
+    enforce_ai_rate_limit,
+    check_database_health,
+    check_ai_service_health,
+    database_health_error
 )
 from app.services.chat_service import EnhancedChatService
 from app.services.ai_service import AIService
+from app.services import ai_tasks
+from app.core.task_queue import get_task_queue
+from app.core.pagination import encode_cursor, decode_cursor, keyset_filter
+from app.core.response_cache import cached_response
 from app.schemas.chat import (
     ChatSessionCreate,
     ChatSessionUpdate,
@@ -20,7 +35,12 @@ from app.schemas.chat import (
     MessageCreate,
     MessageResponse,
     ChatHistoryResponse,
-    MessageHistoryResponse
+    MessageHistoryResponse,
+    ChatAnalyticsResponse,
+    MessageStatistics,
+    AIPerformanceStatistics,
+    BranchingStatistics,
+    UserInteractionStatistics
 )
 from app.schemas.common import SuccessResponse, PaginationParams
 from app.models.user import User
@@ -29,12 +49,97 @@ from app.websocket.manager import connection_manager
 
 router = APIRouter()
 
+# Fields mapped into MessageResponse by the message listing; has_children is
+# computed server-side so child_message_ids never leaves Mongo
+MESSAGE_LIST_PROJECTION = {
+    "chat_session_id": 1,
+    "role": 1,
+    "content": 1,
+    "message_type": 1,
+    "ai_metadata": 1,
+    "formatting": 1,
+    "timestamp": 1,
+    "created_at": 1,
+    "status": 1,
+    "version": 1,
+    "conversation_branch": 1,
+    "user_interaction": 1,
+    "is_streaming": 1,
+    "has_children": {"$gt": [{"$size": {"$ifNull": ["$child_message_ids", []]}}, 0]}
+}
+
+# Export projections: each format fetches only the fields it renders
+_EXPORT_METADATA_FIELDS = (
+    "message_type", "status", "ai_metadata", "formatting", "user_interaction", "conversation_branch"
+)
+_EXPORT_PROJECTIONS = {
+    "json": {"role": 1, "content": 1, "timestamp": 1},
+    "markdown": {"role": 1, "content": 1, "timestamp": 1, "ai_metadata.token_usage": 1},
+    "txt": {"role": 1, "content": 1, "timestamp": 1}
+}
+_EXPORT_PROJECTION_WITH_METADATA = {
+    "role": 1, "content": 1, "timestamp": 1, **{field: 1 for field in _EXPORT_METADATA_FIELDS}
+}
+
+# Content types of streamed (stream=true) markdown and txt exports
+_EXPORT_MEDIA_TYPES = {"markdown": "text/markdown", "txt": "text/plain"}
+
+# Speaker labels for rendered exports, keyed by the stored role string
+_TEXT_ROLE_LABELS = {MessageRole.USER.value: "You"}
+_MARKDOWN_ROLE_LABELS = {MessageRole.USER.value: "**You**"}
+
+# Chat analytics stage; only the $match in front of it varies per request
+_ANALYTICS_FACET = {"$facet": {
+    "stats": [
+        {"$group": {
+            "_id": None,
+            "total_messages": {"$sum": 1},
+            "user_messages": {"$sum": {"$cond": [{"$eq": ["$role", "user"]}, 1, 0]}},
+            "ai_messages": {"$sum": {"$cond": [{"$eq": ["$role", "assistant"]}, 1, 0]}},
+            "failed_messages": {"$sum": {"$cond": [{"$eq": ["$status", "failed"]}, 1, 0]}},
+            "regenerated_messages": {"$sum": "$user_interaction.regeneration_count"},
+            "avg_ai_confidence": {"$avg": "$ai_metadata.confidence_score"},
+            "total_tokens": {"$sum": "$ai_metadata.token_usage.total_tokens"},
+            "total_cost": {"$sum": "$ai_metadata.token_usage.estimated_cost"}
+        }}
+    ],
+    "interactions": [
+        {"$group": {
+            "_id": None,
+            "avg_rating": {"$avg": "$user_interaction.helpful_rating"},
+            "bookmarked_count": {"$sum": {"$cond": ["$user_interaction.bookmarked", 1, 0]}},
+            "shared_count": {"$sum": {"$cond": ["$user_interaction.shared", 1, 0]}}
+        }}
+    ]
+}}
+
+def _parse_chat_id(chat_id: str) -> ObjectId:
+    """Convert a chat id once per request; malformed ids are a 400"""
+    try:
+        return ObjectId(chat_id)
+    except (InvalidId, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid chat session ID"
+        )
+
+def _parse_cursor(after: Optional[str]) -> Optional[Tuple[datetime, ObjectId]]:
+    """Decode a client-supplied keyset cursor; malformed cursors are a 400"""
+    if after is None:
+        return None
+    try:
+        return decode_cursor(after)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+
 @router.post("/", response_model=ChatSessionResponse, status_code=status.HTTP_201_CREATED)
 async def create_chat_session(
     chat_data: ChatSessionCreate,
-    current_user: User = Depends(get_current_active_user),
-    db: AsyncIOMotorDatabase = Depends(get_db),
-    _: None = Depends(check_general_rate_limit)
+    current_user: User = Depends(check_general_rate_limit),
+    chat_service: EnhancedChatService = Depends(get_chat_service)
 ):
     """
     Create a new chat session with enhanced features
@@ -45,198 +150,231 @@ async def create_chat_session(
     - Cost estimation
     - Legal category detection
     """
-    try:
-        chat_service = EnhancedChatService(db)
-        chat = await chat_service.create_chat_session(current_user, chat_data)
-        
-        return ChatSessionResponse(
-            id=str(chat.id),
-            title=chat.title,
-            preview=chat.preview,
-            status=chat.status,
-            metadata=chat.metadata.dict(),
-            tags=chat.tags,
-            created_at=chat.created_at.isoformat(),
-            updated_at=chat.updated_at.isoformat(),
-            last_message_at=chat.last_message_at.isoformat() if chat.last_message_at else None
-        )
-        
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="An error occurred while creating chat session"
-        )
+    chat = await chat_service.create_chat_session(current_user, chat_data)
+    
+    return ChatSessionResponse.from_chat(chat)
 
 @router.get("/", response_model=ChatHistoryResponse)
+@cached_response()
 async def get_user_chats(
+    request: Request,
+    response: Response,
     status_filter: Optional[ChatStatus] = Query(None, description="Filter by chat status"),
     pagination: PaginationParams = Depends(get_pagination_params),
-    current_user: User = Depends(get_current_active_user),
-    db: AsyncIOMotorDatabase = Depends(get_db),
-    _: None = Depends(check_general_rate_limit)
+    current_user: User = Depends(check_general_rate_limit),
+    chat_service: EnhancedChatService = Depends(get_chat_service)
 ):
     """
     Get user's chat sessions with pagination and filtering
+    
+    **Pagination:** pass `next_cursor` back as `after` to fetch the following page.
+    `page` is deprecated and only used when `after` is not given.
+    """
+    after = _parse_cursor(pagination.after)
+    skip = (pagination.page - 1) * pagination.size
+    
+    # Get chat sessions; one extra tells us whether another page follows
+    chats = await chat_service.get_user_chat_sessions(
+        current_user, 
+        status=status_filter, 
+        limit=pagination.size + 1, 
+        skip=skip,
+        after=after
+    )
+    has_next = len(chats) > pagination.size
+    chats = chats[:pagination.size]
+    
+    # Get total count
+    query = {
+        "user_id": current_user.id,
+        "status": {"$ne": ChatStatus.DELETED}
+    }
+    if status_filter:
+        query["status"] = status_filter
+        
+    total = await chat_service.chat_sessions_collection.count_documents(query)
+    
+    # Convert to response format
+    chat_responses = []
+    for chat in chats:
+        chat_response = ChatSessionResponse.from_chat(chat)
+        chat_responses.append(chat_response)
+    
+    return ChatHistoryResponse(
+        chat_sessions=chat_responses,
+        total=total,
+        page=pagination.page,
+        size=pagination.size,
+        has_next=has_next,
+        next_cursor=encode_cursor(chats[-1].updated_at, chats[-1].id) if has_next else None
+    )
+
+# Static paths must be registered before /{chat_id} or they are routed there
+@router.get("/search", response_model=MessageHistoryResponse)
+@cached_response(ttl=60)  # Repeated queries from the same user skip the text search
+async def search_messages(
+    request: Request,
+    response: Response,
+    query: str = Query(..., min_length=3, description="Search query"),
+    chat_id: Optional[str] = Query(None, description="Limit search to specific chat"),
+    pagination: PaginationParams = Depends(get_pagination_params),
+    current_user: User = Depends(check_general_rate_limit),
+    chat_service: EnhancedChatService = Depends(get_chat_service)
+):
+    """
+    Search messages across user's chats
+    
+    **Pagination:** pass `next_cursor` back as `after` to fetch the following page.
+    """
+    after = _parse_cursor(pagination.after)
+    skip = (pagination.page - 1) * pagination.size
+    
+    # Perform search; one extra tells us whether another page follows
+    messages, total = await chat_service.search_messages(
+        current_user, 
+        query, 
+        chat_id=chat_id, 
+        limit=pagination.size + 1, 
+        skip=skip,
+        after=after
+    )
+    has_next = len(messages) > pagination.size
+    messages = messages[:pagination.size]
+    
+    return MessageHistoryResponse(
+        messages=[MessageResponse.from_doc(doc) for doc in messages],
+        total=total,
+        page=pagination.page,
+        size=pagination.size,
+        has_next=has_next,
+        next_cursor=encode_cursor(messages[-1]["timestamp"], messages[-1]["_id"]) if has_next else None
+    )
+
+@router.get("/statistics", response_model=Dict[str, Any])
+@cached_response(ttl=300)  # Aggregates over every chat; writes still invalidate it
+async def get_user_chat_statistics(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(check_general_rate_limit),
+    chat_service: EnhancedChatService = Depends(get_chat_service)
+):
+    """
+    Get comprehensive chat statistics for the user
+    """
+    statistics = await chat_service.get_chat_statistics(current_user)
+    return statistics
+
+@router.get("/health", response_model=Dict[str, Any])
+async def get_chat_service_health(
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    chat_service: EnhancedChatService = Depends(get_chat_service),
+    ai_service: AIService = Depends(get_ai_service)
+):
+    """
+    Get health status of chat services
     """
     try:
-        chat_service = EnhancedChatService(db)
-        
-        skip = (pagination.page - 1) * pagination.size
+        # Check database connectivity; probes are shared with the other health
+        # endpoints and reused for a short window
+        if not await check_database_health(db):
+            return {
+                "status": "unhealthy",
+                "error": database_health_error(),
+                "timestamp": datetime.utcnow().isoformat()
+            }
+        ai_available = await check_ai_service_health(ai_service)
         
-        # Get chat sessions
-        chats = await chat_service.get_user_chat_sessions(
-            current_user, 
-            status=status_filter, 
-            limit=pagination.size, 
-            skip=skip
-        )
+        # Get service stats
+        pending_count = len(chat_service.pending_messages)
+        streaming_count = len(chat_service.streaming_messages)
         
-        # Get total count
-        query = {
-            "user_id": current_user.id,
-            "status": {"$ne": ChatStatus.DELETED}
+        health_data = {
+            "status": "healthy",
+            "timestamp": datetime.utcnow().isoformat(),
+            "services": {
+                "database": "healthy",
+                "ai_service": "healthy" if ai_available else "unavailable",
+                "websocket": "healthy"
+            },
+            "metrics": {
+                "pending_messages": pending_count,
+                "streaming_messages": streaming_count,
+                "cache_entries": len(ai_service.response_cache),
+                "active_contexts": len(ai_service.context_manager.contexts)
+            },
+            "features": {
+                "message_status_tracking": True,
+                "conversation_branching": True,
+                "ai_streaming": True,
+                "token_management": True,
+                "cost_tracking": True,
+                "response_caching": True
+            }
         }
-        if status_filter:
-            query["status"] = status_filter
-            
-        total = await chat_service.chat_sessions_collection.count_documents(query)
-        
-        # Convert to response format
-        chat_responses = []
-        for chat in chats:
-            chat_response = ChatSessionResponse(
-                id=str(chat.id),
-                title=chat.title,
-                preview=chat.preview,
-                status=chat.status,
-                metadata=chat.metadata.dict(),
-                tags=chat.tags,
-                created_at=chat.created_at.isoformat(),
-                updated_at=chat.updated_at.isoformat(),
-                last_message_at=chat.last_message_at.isoformat() if chat.last_message_at else None
-            )
-            chat_responses.append(chat_response)
         
-        return ChatHistoryResponse(
-            chat_sessions=chat_responses,
-            total=total,
-            page=pagination.page,
-            size=pagination.size,
-            has_next=skip + pagination.size < total
-        )
+        return health_data
         
-    except HTTPException:
-        raise
     except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="An error occurred while fetching chat sessions"
-        )
+        return {
+            "status": "unhealthy",
+            "error": str(e),
+            "timestamp": datetime.utcnow().isoformat()
+        }
 
 @router.get("/{chat_id}", response_model=ChatSessionResponse)
+@cached_response()
 async def get_chat_session(
     chat_id: str,
-    current_user: User = Depends(get_current_active_user),
-    db: AsyncIOMotorDatabase = Depends(get_db),
-    _: None = Depends(check_general_rate_limit)
+    request: Request,
+    response: Response,
+    current_user: User = Depends(check_general_rate_limit),
+    chat_service: EnhancedChatService = Depends(get_chat_service)
 ):
     """
     Get a specific chat session
     """
-    try:
-        chat_service = EnhancedChatService(db)
-        chat = await chat_service.get_chat_session(chat_id, current_user)
-        
-        return ChatSessionResponse(
-            id=str(chat.id),
-            title=chat.title,
-            preview=chat.preview,
-            status=chat.status,
-            metadata=chat.metadata.dict(),
-            tags=chat.tags,
-            created_at=chat.created_at.isoformat(),
-            updated_at=chat.updated_at.isoformat(),
-            last_message_at=chat.last_message_at.isoformat() if chat.last_message_at else None
-        )
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="An error occurred while fetching chat session"
-        )
+    chat = await chat_service.get_chat_session(chat_id, current_user)
+    
+    return ChatSessionResponse.from_chat(chat)
 
 @router.put("/{chat_id}", response_model=ChatSessionResponse)
 async def update_chat_session(
     chat_id: str,
     update_data: ChatSessionUpdate,
-    current_user: User = Depends(get_current_active_user),
-    db: AsyncIOMotorDatabase = Depends(get_db),
-    _: None = Depends(check_general_rate_limit)
+    current_user: User = Depends(check_general_rate_limit),
+    chat_service: EnhancedChatService = Depends(get_chat_service)
 ):
     """
     Update a chat session
     """
-    try:
-        chat_service = EnhancedChatService(db)
-        chat = await chat_service.update_chat_session(chat_id, current_user, update_data)
-        
-        return ChatSessionResponse(
-            id=str(chat.id),
-            title=chat.title,
-            preview=chat.preview,
-            status=chat.status,
-            metadata=chat.metadata.dict(),
-            tags=chat.tags,
-            created_at=chat.created_at.isoformat(),
-            updated_at=chat.updated_at.isoformat(),
-            last_message_at=chat.last_message_at.isoformat() if chat.last_message_at else None
-        )
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="An error occurred while updating chat session"
-        )
+    chat = await chat_service.update_chat_session(chat_id, current_user, update_data)
+    
+    return ChatSessionResponse.from_chat(chat)
 
 @router.delete("/{chat_id}", response_model=SuccessResponse)
 async def delete_chat_session(
     chat_id: str,
     hard_delete: bool = Query(False, description="Permanently delete (cannot be undone)"),
-    current_user: User = Depends(get_current_active_user),
-    db: AsyncIOMotorDatabase = Depends(get_db),
-    _: None = Depends(check_general_rate_limit)
+    current_user: User = Depends(check_general_rate_limit),
+    chat_service: EnhancedChatService = Depends(get_chat_service)
 ):
     """
     Delete a chat session
     """
-    try:
-        chat_service = EnhancedChatService(db)
-        success = await chat_service.delete_chat_session(chat_id, current_user, soft_delete=not hard_delete)
-        
-        if success:
-            return SuccessResponse(
-                message="Chat session deleted successfully",
-                data={
-                    "chat_id": chat_id,
-                    "hard_delete": hard_delete
-                }
-            )
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Failed to delete chat session"
-            )
-        
-    except HTTPException:
-        raise
-    except Exception as e:
+    success = await chat_service.delete_chat_session(chat_id, current_user, soft_delete=not hard_delete)
+    
+    if success:
+        return SuccessResponse(
+            message="Chat session deleted successfully",
+            data={
+                "chat_id": chat_id,
+                "hard_delete": hard_delete
+            }
+        )
+    else:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="An error occurred while deleting chat session"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Failed to delete chat session"
         )
 
 @router.post("/{chat_id}/messages", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
@@ -244,11 +382,12 @@ async def send_message(
     chat_id: str,
     message_data: MessageCreate,
     background_tasks: BackgroundTasks,
-    current_user: User = Depends(get_current_active_user),
-    db: AsyncIOMotorDatabase = Depends(get_db),
+    request: Request,
+    response: Response,
+    current_user: User = Depends(authenticated_active_user),
+    chat_service: EnhancedChatService = Depends(get_chat_service),
     response_format: ResponseFormat = Query(ResponseFormat.MARKDOWN, description="Response format"),
-    regenerate: bool = Query(False, description="Force regeneration even if similar query exists"),
-    _: None = Depends(check_ai_rate_limit)
+    regenerate: bool = Query(False, description="Force regeneration even if similar query exists")
 ):
     """
     Send a message with enhanced AI integration
@@ -260,144 +399,56 @@ async def send_message(
     - Conversation context management
     - Response caching
     - Error handling and retry logic
+    
+    Only user messages trigger AI generation, so only they are charged to the AI
+    rate limit; other roles (imports, seeding) use the general limit.
     """
-    try:
-        chat_service = EnhancedChatService(db)
-        ai_service = AIService(db)
-        
-        # Add user message with status tracking
-        user_message = await chat_service.add_message_with_status_tracking(
-            chat_id, current_user, message_data
-        )
-        
-        # Prepare response
-        user_response = MessageResponse(
-            id=str(user_message.id),
-            chat_session_id=str(user_message.chat_session_id),
-            role=user_message.role,
-            content=user_message.content,
-            message_type=user_message.message_type,
-            ai_metadata=user_message.ai_metadata.dict() if user_message.ai_metadata else None,
-            formatting=user_message.formatting.dict() if user_message.formatting else None,
-            timestamp=user_message.timestamp.isoformat(),
-            created_at=user_message.created_at.isoformat()
-        )
-        
-        # Generate AI response if it's a user message and AI is available
-        if message_data.role == MessageRole.USER and ai_service.is_available():
-            background_tasks.add_task(
-                generate_ai_response_background,
-                chat_id, message_data.content, current_user, db, response_format, regenerate
-            )
-        
+    if message_data.role == MessageRole.USER:
+        enforce_ai_rate_limit(current_user, response)
+    else:
+        enforce_general_rate_limit(current_user, response)
+    
+    # Add user message with status tracking
+    user_message = await chat_service.add_message_with_status_tracking(
+        chat_id, current_user, message_data
+    )
+    
+    # Prepare response
+    user_response = MessageResponse.from_message(user_message)
+    
+    # Only user messages get an AI response
+    if message_data.role != MessageRole.USER:
         return user_response
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="An error occurred while sending message"
-        )
-
-async def generate_ai_response_background(
-    chat_id: str, 
-    user_message: str, 
-    user: User, 
-    db: AsyncIOMotorDatabase,
-    response_format: ResponseFormat,
-    regenerate: bool
-):
-    """Background task for AI response generation"""
-    try:
-        chat_service = EnhancedChatService(db)
-        ai_service = AIService(db)
-        
-        # Create pending AI message
-        ai_message_create = MessageCreate(
-            content="",
-            role=MessageRole.ASSISTANT
-        )
-        
-        ai_message = await chat_service.create_pending_message(
-            chat_id, user, ai_message_create
-        )
-        
-        stream_id = ai_message.stream_id
-        
-        # Notify WebSocket clients that AI response started
-        await connection_manager.broadcast_to_chat(
-            chat_id,
-            {
-                "type": "ai_response_started",
-                "message_id": str(ai_message.id),
-                "metadata": {
-                    "chat_id": chat_id,
-                    "stream_id": stream_id
-                }
-            }
-        )
-        
-        # Generate AI response
-        ai_response = await ai_service.generate_response(
-            user_message,
-            chat_id,
-            user,
-            response_format=response_format,
-            regenerate=regenerate
-        )
-        
-        if ai_response["success"]:
-            # Complete the message
-            await chat_service.complete_streaming_message(
-                stream_id,
-                ai_response["content"],
-                ai_response["metadata"],
-                ai_response.get("formatting")
-            )
-            
-            # Notify WebSocket clients of completion
-            await connection_manager.broadcast_to_chat(
-                chat_id,
-                {
-                    "type": "ai_response_complete",
-                    "content": ai_response["content"],
-                    "message_id": str(ai_message.id),
-                    "metadata": {
-                        "chat_id": chat_id,
-                        "ai_metadata": ai_response["metadata"].dict() if ai_response["metadata"] else None
-                    }
-                }
+    
+    # The AI service is only resolved on the path that uses it
+    ai_service = get_ai_service(request)
+    if ai_service.is_available():
+        queue = get_task_queue()
+        if queue is not None:
+            await queue.enqueue_job(
+                "generate_ai_response_task",
+                chat_id, message_data.content, str(current_user.id), response_format.value, regenerate
             )
         else:
-            # Mark message as failed
-            await chat_service.fail_message(stream_id, ai_response.get("content", "AI generation failed"))
-            
-            # Notify WebSocket clients of error
-            await connection_manager.broadcast_to_chat(
-                chat_id,
-                {
-                    "type": "ai_response_error",
-                    "error": ai_response.get("content", "AI generation failed"),
-                    "message_id": str(ai_message.id),
-                    "metadata": {"chat_id": chat_id}
-                }
+            background_tasks.add_task(
+                ai_tasks.generate_ai_response,
+                chat_id, message_data.content, current_user, chat_service, ai_service, response_format, regenerate,
+                connection_manager.broadcast_raw
             )
-            
-    except Exception as e:
-        # Handle any errors in background task
-        if 'stream_id' in locals():
-            await chat_service.fail_message(stream_id, f"Background generation error: {str(e)}")
+    
+    return user_response
 
 @router.get("/{chat_id}/messages", response_model=MessageHistoryResponse)
+@cached_response()
 async def get_chat_messages(
     chat_id: str,
+    request: Request,
+    response: Response,
     branch_id: Optional[str] = Query(None, description="Specific branch to get messages from"),
     include_inactive: bool = Query(False, description="Include messages from inactive branches"),
     pagination: PaginationParams = Depends(get_pagination_params),
-    current_user: User = Depends(get_current_active_user),
-    db: AsyncIOMotorDatabase = Depends(get_db),
-    _: None = Depends(check_general_rate_limit)
+    current_user: User = Depends(check_general_rate_limit),
+    chat_service: EnhancedChatService = Depends(get_chat_service)
 ):
     """
     Get messages for a chat session with enhanced filtering
@@ -407,90 +458,88 @@ async def get_chat_messages(
     - Status-based filtering
     - Message versioning support
     - Rich metadata inclusion
+    
+    **Pagination:** pass `next_cursor` back as `after` to fetch the following page.
+    `page` is deprecated and only used when `after` is not given.
     """
-    try:
-        chat_service = EnhancedChatService(db)
-        
-        # Verify chat ownership
-        await chat_service.get_chat_session(chat_id, current_user)
-        
-        skip = (pagination.page - 1) * pagination.size
-        
-        # Build query based on branch filtering
-        if branch_id:
-            query = {
-                "chat_session_id": ObjectId(chat_id),
-                "conversation_branch.branch_id": branch_id
-            }
-        elif include_inactive:
-            query = {"chat_session_id": ObjectId(chat_id)}
-        else:
-            query = {
-                "chat_session_id": ObjectId(chat_id),
-                "$or": [
-                    {"conversation_branch.is_active_branch": True},
-                    {"conversation_branch": None}  # Main conversation
-                ]
-            }
-        
-        # Get total count
-        total = await chat_service.messages_collection.count_documents(query)
-        
-        # Get messages with enhanced data
-        cursor = chat_service.messages_collection.find(query).sort("timestamp", 1).skip(skip).limit(pagination.size)
-        message_docs = await cursor.to_list(length=pagination.size)
-        
-        messages = []
-        for doc in message_docs:
-            message_response = MessageResponse(
-                id=str(doc["_id"]),
-                chat_session_id=str(doc["chat_session_id"]),
-                role=doc["role"],
-                content=doc["content"],
-                message_type=doc["message_type"],
-                ai_metadata=doc.get("ai_metadata"),
-                formatting=doc.get("formatting"),
-                timestamp=doc["timestamp"].isoformat(),
-                created_at=doc["created_at"].isoformat()
-            )
-            
-            # Add enhanced metadata
-            message_response.metadata = {
-                "status": doc.get("status", "complete"),
-                "version": doc.get("version", 1),
-                "branch_info": doc.get("conversation_branch"),
-                "user_interaction": doc.get("user_interaction"),
-                "has_children": len(doc.get("child_message_ids", [])) > 0,
-                "is_streaming": doc.get("is_streaming", False)
-            }
-            
-            messages.append(message_response)
-        
-        return MessageHistoryResponse(
-            messages=messages,
-            total=total,
-            page=pagination.page,
-            size=pagination.size,
-            has_next=skip + pagination.size < total
-        )
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="An error occurred while fetching chat messages"
-        )
+    chat_oid = _parse_chat_id(chat_id)
+    after = _parse_cursor(pagination.after)
+    
+    skip = (pagination.page - 1) * pagination.size
+    
+    # Build query based on branch filtering; user_id scopes it to the caller's
+    # messages, so it is safe to run alongside the ownership check
+    if branch_id:
+        query = {
+            "chat_session_id": chat_oid,
+            "user_id": current_user.id,
+            "conversation_branch.branch_id": branch_id
+        }
+    elif include_inactive:
+        query = {"chat_session_id": chat_oid, "user_id": current_user.id}
+    else:
+        query = {
+            "chat_session_id": chat_oid,
+            "user_id": current_user.id,
+            "active_visible": True  # Main conversation or active branch
+        }
+    
+    # (timestamp, _id) gives a total order even when timestamps collide
+    sort = [("timestamp", 1), ("_id", 1)]
+    if after:
+        # Keyset page: an index seek past the cursor instead of skipping documents;
+        # one extra document tells us whether another page follows
+        page_query = {**query, **keyset_filter("timestamp", *after, 1)}
+        cursor = chat_service.messages_collection.find(page_query, MESSAGE_LIST_PROJECTION).sort(sort)
+        fetch = cursor.limit(pagination.size + 1).to_list(length=pagination.size + 1)
+    else:
+        # Deprecated page/skip path
+        cursor = chat_service.messages_collection.find(query, MESSAGE_LIST_PROJECTION).sort(sort)
+        fetch = cursor.skip(skip).limit(pagination.size).to_list(length=pagination.size)
+    
+    # Ownership check (404 for missing, foreign or deleted chats), count and page in one round trip
+    _, total, message_docs = await asyncio.gather(
+        chat_service.get_chat_session(chat_id, current_user),
+        chat_service.messages_collection.count_documents(query),
+        fetch
+    )
+    
+    if after:
+        has_next = len(message_docs) > pagination.size
+        message_docs = message_docs[:pagination.size]
+    else:
+        has_next = skip + pagination.size < total
+    
+    messages = [
+        MessageResponse.from_doc(doc, metadata={
+            "status": doc.get("status", "complete"),
+            "version": doc.get("version", 1),
+            "branch_info": doc.get("conversation_branch"),
+            "user_interaction": doc.get("user_interaction"),
+            "has_children": doc.get("has_children", False),
+            "is_streaming": doc.get("is_streaming", False)
+        })
+        for doc in message_docs
+    ]
+    
+    return MessageHistoryResponse(
+        messages=messages,
+        total=total,
+        page=pagination.page,
+        size=pagination.size,
+        has_next=has_next,
+        next_cursor=encode_cursor(message_docs[-1]["timestamp"], message_docs[-1]["_id"]) if has_next else None
+    )
 
 @router.post("/{chat_id}/messages/{message_id}/regenerate", response_model=MessageResponse)
 async def regenerate_message(
     chat_id: str,
     message_id: str,
     background_tasks: BackgroundTasks,
-    current_user: User = Depends(get_current_active_user),
-    db: AsyncIOMotorDatabase = Depends(get_db),
-    response_format: ResponseFormat = Query(ResponseFormat.MARKDOWN, description="Response format"),
-    _: None = Depends(check_ai_rate_limit)
+    request: Request,
+    current_user: User = Depends(check_ai_rate_limit),
+    chat_service: EnhancedChatService = Depends(get_chat_service),
+    response_format: ResponseFormat = Query(ResponseFormat.MARKDOWN, description="Response format")
 ):
     """
     Regenerate an AI response or create an alternative version
@@ -500,96 +549,41 @@ async def regenerate_message(
     - Maintains message history
     - Supports different response formats
     """
-    try:
-        chat_service = EnhancedChatService(db)
-        
-        # Create regenerated message
-        regenerated_message = await chat_service.regenerate_message(message_id, current_user)
-        
-        # If it's an AI message, generate new response in background
-        if regenerated_message.role == MessageRole.ASSISTANT:
-            # Get the user message that prompted this response
-            messages = await chat_service.get_active_messages(chat_id, current_user)
-            user_message = None
-            
-            for msg in reversed(messages):
-                if msg.role == MessageRole.USER and msg.timestamp < regenerated_message.timestamp:
-                    user_message = msg
-                    break
-            
-            if user_message:
+    # Create regenerated message
+    regenerated_message = await chat_service.regenerate_message(message_id, current_user)
+    
+    # If it's an AI message, generate new response in background
+    if regenerated_message.role == MessageRole.ASSISTANT:
+        # Get the user message that prompted this response; the message's own
+        # chat was ownership-checked by regenerate_message above
+        user_message = await chat_service.find_previous_user_message(
+            str(regenerated_message.chat_session_id), regenerated_message.timestamp
+        )
+        
+        if user_message:
+            queue = get_task_queue()
+            if queue is not None:
+                await queue.enqueue_job(
+                    "regenerate_ai_response_task",
+                    chat_id, user_message.content, str(current_user.id),
+                    regenerated_message.stream_id, response_format.value
+                )
+            else:
                 background_tasks.add_task(
-                    regenerate_ai_response_background,
-                    chat_id, user_message.content, current_user, db, 
+                    ai_tasks.regenerate_ai_response,
+                    chat_id, user_message.content, current_user, chat_service, get_ai_service(request), 
                     regenerated_message.stream_id, response_format
                 )
-        
-        return MessageResponse(
-            id=str(regenerated_message.id),
-            chat_session_id=str(regenerated_message.chat_session_id),
-            role=regenerated_message.role,
-            content=regenerated_message.content,
-            message_type=regenerated_message.message_type,
-            ai_metadata=regenerated_message.ai_metadata.dict() if regenerated_message.ai_metadata else None,
-            formatting=regenerated_message.formatting.dict() if regenerated_message.formatting else None,
-            timestamp=regenerated_message.timestamp.isoformat(),
-            created_at=regenerated_message.created_at.isoformat()
-        )
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="An error occurred while regenerating message"
-        )
-
-async def regenerate_ai_response_background(
-    chat_id: str,
-    user_message: str,
-    user: User,
-    db: AsyncIOMotorDatabase,
-    stream_id: str,
-    response_format: ResponseFormat
-):
-    """Background task for AI response regeneration"""
-    try:
-        chat_service = EnhancedChatService(db)
-        ai_service = AIService(db)
-        
-        # Start streaming for regeneration
-        await chat_service.start_message_streaming(stream_id)
-        
-        # Generate new AI response (force regeneration)
-        ai_response = await ai_service.generate_response(
-            user_message,
-            chat_id,
-            user,
-            response_format=response_format,
-            regenerate=True  # Force regeneration
-        )
-        
-        if ai_response["success"]:
-            await chat_service.complete_streaming_message(
-                stream_id,
-                ai_response["content"],
-                ai_response["metadata"],
-                ai_response.get("formatting")
-            )
-        else:
-            await chat_service.fail_message(stream_id, ai_response.get("content", "Regeneration failed"))
-            
-    except Exception as e:
-        await chat_service.fail_message(stream_id, f"Regeneration error: {str(e)}")
+    
+    return MessageResponse.from_message(regenerated_message)
 
 @router.post("/{chat_id}/messages/{message_id}/interact", response_model=SuccessResponse)
 async def update_message_interaction(
     chat_id: str,
     message_id: str,
     interaction_data: Dict[str, Any],
-    current_user: User = Depends(get_current_active_user),
-    db: AsyncIOMotorDatabase = Depends(get_db),
-    _: None = Depends(check_general_rate_limit)
+    current_user: User = Depends(check_general_rate_limit),
+    chat_service: EnhancedChatService = Depends(get_chat_service)
 ):
     """
     Update user interaction data for a message
@@ -600,41 +594,30 @@ async def update_message_interaction(
     - bookmarked: Boolean bookmark status
     - shared: Boolean share status
     """
-    try:
-        chat_service = EnhancedChatService(db)
-        
-        success = await chat_service.update_message_interaction(
-            message_id, current_user, interaction_data
+    user_interaction = await chat_service.update_message_interaction(
+        message_id, current_user, interaction_data
+    )
+    
+    if user_interaction is not None:
+        return SuccessResponse(
+            message="Message interaction updated successfully",
+            data={
+                "message_id": message_id,
+                "interaction_data": interaction_data,
+                "user_interaction": user_interaction
+            }
         )
-        
-        if success:
-            return SuccessResponse(
-                message="Message interaction updated successfully",
-                data={
-                    "message_id": message_id,
-                    "interaction_data": interaction_data
-                }
-            )
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Message not found or access denied"
-            )
-        
-    except HTTPException:
-        raise
-    except Exception as e:
+    else:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="An error occurred while updating message interaction"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Message not found or access denied"
         )
 
 @router.get("/{chat_id}/branches", response_model=List[Dict[str, Any]])
 async def get_conversation_branches(
     chat_id: str,
-    current_user: User = Depends(get_current_active_user),
-    db: AsyncIOMotorDatabase = Depends(get_db),
-    _: None = Depends(check_general_rate_limit)
+    current_user: User = Depends(check_general_rate_limit),
+    chat_service: EnhancedChatService = Depends(get_chat_service)
 ):
     """
     Get all conversation branches for a chat session
@@ -644,26 +627,15 @@ async def get_conversation_branches(
     - Branch points and reasons
     - Message counts per branch
     """
-    try:
-        chat_service = EnhancedChatService(db)
-        branches = await chat_service.get_conversation_branches(chat_id, current_user)
-        return branches
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="An error occurred while fetching conversation branches"
-        )
+    branches = await chat_service.get_conversation_branches(chat_id, current_user)
+    return branches
 
 @router.post("/{chat_id}/branches/{branch_id}/switch", response_model=SuccessResponse)
 async def switch_conversation_branch(
     chat_id: str,
     branch_id: str,
-    current_user: User = Depends(get_current_active_user),
-    db: AsyncIOMotorDatabase = Depends(get_db),
-    _: None = Depends(check_general_rate_limit)
+    current_user: User = Depends(check_general_rate_limit),
+    chat_service: EnhancedChatService = Depends(get_chat_service)
 ):
     """
     Switch to a different conversation branch
@@ -673,50 +645,43 @@ async def switch_conversation_branch(
     - Deactivates other branches
     - Updates conversation context
     """
-    try:
-        chat_service = EnhancedChatService(db)
-        success = await chat_service.switch_conversation_branch(chat_id, branch_id, current_user)
-        
-        if success:
-            # Notify WebSocket clients of branch switch
-            await connection_manager.broadcast_to_chat(
-                chat_id,
-                {
-                    "type": "branch_switched",
-                    "metadata": {
-                        "chat_id": chat_id,
-                        "branch_id": branch_id
-                    }
-                }
-            )
-            
-            return SuccessResponse(
-                message="Successfully switched to conversation branch",
-                data={
+    success = await chat_service.switch_conversation_branch(chat_id, branch_id, current_user)
+    
+    if success:
+        # Notify WebSocket clients of branch switch
+        await connection_manager.broadcast_raw(
+            chat_id,
+            orjson.dumps({
+                "type": "branch_switched",
+                "metadata": {
                     "chat_id": chat_id,
                     "branch_id": branch_id
                 }
-            )
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Failed to switch conversation branch"
-            )
+            })
+        )
         
-    except HTTPException:
-        raise
-    except Exception as e:
+        return SuccessResponse(
+            message="Successfully switched to conversation branch",
+            data={
+                "chat_id": chat_id,
+                "branch_id": branch_id
+            }
+        )
+    else:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="An error occurred while switching conversation branch"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Failed to switch conversation branch"
         )
 
-@router.get("/{chat_id}/analytics", response_model=Dict[str, Any])
+@router.get("/{chat_id}/analytics", response_model=ChatAnalyticsResponse)
+@cached_response()
 async def get_chat_analytics(
     chat_id: str,
-    current_user: User = Depends(get_current_active_user),
-    db: AsyncIOMotorDatabase = Depends(get_db),
-    _: None = Depends(check_general_rate_limit)
+    request: Request,
+    response: Response,
+    current_user: User = Depends(check_general_rate_limit),
+    chat_service: EnhancedChatService = Depends(get_chat_service),
+    ai_service: AIService = Depends(get_ai_service)
 ):
     """
     Get enhanced analytics for a chat session
@@ -728,103 +693,75 @@ async def get_chat_analytics(
     - User interaction patterns
     - AI performance metrics
     """
-    try:
-        chat_service = EnhancedChatService(db)
-        ai_service = AIService(db)
-        
-        # Verify chat ownership
-        chat = await chat_service.get_chat_session(chat_id, current_user)
-        
-        # Get conversation health
-        conversation_health = await ai_service.get_conversation_health(chat_id)
-        
-        # Get message statistics
-        pipeline = [
-            {"$match": {"chat_session_id": ObjectId(chat_id)}},
-            {"$group": {
-                "_id": None,
-                "total_messages": {"$sum": 1},
-                "user_messages": {"$sum": {"$cond": [{"$eq": ["$role", "user"]}, 1, 0]}},
-                "ai_messages": {"$sum": {"$cond": [{"$eq": ["$role", "assistant"]}, 1, 0]}},
-                "failed_messages": {"$sum": {"$cond": [{"$eq": ["$status", "failed"]}, 1, 0]}},
-                "regenerated_messages": {"$sum": "$user_interaction.regeneration_count"},
-                "avg_ai_confidence": {"$avg": "$ai_metadata.confidence_score"},
-                "total_tokens": {"$sum": "$ai_metadata.token_usage.total_tokens"},
-                "total_cost": {"$sum": "$ai_metadata.token_usage.estimated_cost"}
-            }}
-        ]
-        
-        result = await chat_service.messages_collection.aggregate(pipeline).to_list(1)
-        stats = result[0] if result else {}
-        
-        # Get branch statistics
+    chat_oid = _parse_chat_id(chat_id)
+    
+    # Message and interaction statistics in one pass over the chat's messages;
+    # matching on user_id too means the facet never reads another user's chat
+    pipeline = [{"$match": {"chat_session_id": chat_oid, "user_id": current_user.id}}, _ANALYTICS_FACET]
+    
+    # Ownership check (which also loads the metadata reported below), health and
+    # statistics are independent; run them together
+    chat, conversation_health, faceted = await asyncio.gather(
+        chat_service.get_chat_session(chat_id, current_user),
+        ai_service.get_conversation_health(chat_id),
+        chat_service.messages_collection.aggregate(pipeline).to_list(1)
+    )
+    
+    # Most chats never branch; only aggregate branches when some exist
+    if chat.branch_count == 0:
+        branches = []
+    else:
         branches = await chat_service.get_conversation_branches(chat_id, current_user)
-        
-        # Get user interaction stats
-        interaction_pipeline = [
-            {"$match": {"chat_session_id": ObjectId(chat_id)}},
-            {"$group": {
-                "_id": None,
-                "avg_rating": {"$avg": "$user_interaction.helpful_rating"},
-                "bookmarked_count": {"$sum": {"$cond": ["$user_interaction.bookmarked", 1, 0]}},
-                "shared_count": {"$sum": {"$cond": ["$user_interaction.shared", 1, 0]}}
-            }}
-        ]
-        
-        interaction_result = await chat_service.messages_collection.aggregate(interaction_pipeline).to_list(1)
-        interaction_stats = interaction_result[0] if interaction_result else {}
-        
-        analytics = {
-            "chat_id": chat_id,
-            "chat_metadata": chat.metadata.dict(),
-            "conversation_health": conversation_health,
-            "message_statistics": {
-                "total_messages": stats.get("total_messages", 0),
-                "user_messages": stats.get("user_messages", 0),
-                "ai_messages": stats.get("ai_messages", 0),
-                "failed_messages": stats.get("failed_messages", 0),
-                "regenerated_messages": stats.get("regenerated_messages", 0),
-                "success_rate": (1 - (stats.get("failed_messages", 0) / max(stats.get("ai_messages", 1), 1))) * 100
-            },
-            "ai_performance": {
-                "avg_confidence": round(stats.get("avg_ai_confidence", 0) or 0, 2),
-                "total_tokens": stats.get("total_tokens", 0),
-                "total_cost": round(stats.get("total_cost", 0) or 0, 4),
-                "avg_cost_per_message": round((stats.get("total_cost", 0) or 0) / max(stats.get("ai_messages", 1), 1), 4)
-            },
-            "branching_statistics": {
-                "total_branches": len(branches),
-                "active_branches": len([b for b in branches if b.get("is_active")]),
-                "branch_points": [b.get("branch_reason") for b in branches]
-            },
-            "user_interaction": {
-                "avg_rating": round(interaction_stats.get("avg_rating", 0) or 0, 2),
-                "bookmarked_messages": interaction_stats.get("bookmarked_count", 0),
-                "shared_messages": interaction_stats.get("shared_count", 0)
-            },
-            "legal_categories": chat.metadata.legal_categories,
-            "generated_at": datetime.utcnow().isoformat()
-        }
-        
-        return analytics
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="An error occurred while fetching chat analytics"
-        )
+    
+    facets = faceted[0] if faceted else {}
+    stats = facets["stats"][0] if facets.get("stats") else {}
+    interaction_stats = facets["interactions"][0] if facets.get("interactions") else {}
+    
+    ai_messages = max(stats.get("ai_messages", 1), 1)
+    total_cost = stats.get("total_cost", 0) or 0
+    
+    return ChatAnalyticsResponse(
+        chat_id=chat_id,
+        chat_metadata=chat.metadata.model_dump(mode="json"),
+        conversation_health=conversation_health,
+        message_statistics=MessageStatistics(
+            total_messages=stats.get("total_messages", 0),
+            user_messages=stats.get("user_messages", 0),
+            ai_messages=stats.get("ai_messages", 0),
+            failed_messages=stats.get("failed_messages", 0),
+            regenerated_messages=stats.get("regenerated_messages", 0),
+            success_rate=(1 - (stats.get("failed_messages", 0) / ai_messages)) * 100
+        ),
+        ai_performance=AIPerformanceStatistics(
+            avg_confidence=round(stats.get("avg_ai_confidence", 0) or 0, 2),
+            total_tokens=stats.get("total_tokens", 0),
+            total_cost=round(total_cost, 4),
+            avg_cost_per_message=round(total_cost / ai_messages, 4)
+        ),
+        branching_statistics=BranchingStatistics(
+            total_branches=len(branches),
+            active_branches=sum(1 for b in branches if b.get("is_active")),
+            branch_points=[b.get("branch_reason") for b in branches]
+        ),
+        user_interaction=UserInteractionStatistics(
+            avg_rating=round(interaction_stats.get("avg_rating", 0) or 0, 2),
+            bookmarked_messages=interaction_stats.get("bookmarked_count", 0),
+            shared_messages=interaction_stats.get("shared_count", 0)
+        ),
+        legal_categories=chat.metadata.legal_categories,
+        generated_at=datetime.utcnow()
+    )
 
 @router.post("/{chat_id}/export", response_model=Dict[str, Any])
 async def export_conversation(
     chat_id: str,
+    response: Response,
     format: str = Query("json", regex="^(json|markdown|txt)$", description="Export format"),
     include_metadata: bool = Query(True, description="Include message metadata"),
     include_branches: bool = Query(False, description="Include all conversation branches"),
-    current_user: User = Depends(get_current_active_user),
-    db: AsyncIOMotorDatabase = Depends(get_db),
-    _: None = Depends(check_general_rate_limit)
+    stream: bool = Query(False, description="Stream markdown/txt as a raw document body instead of JSON"),
+    current_user: User = Depends(check_general_rate_limit),
+    chat_service: EnhancedChatService = Depends(get_chat_service)
 ):
     """
     Export conversation in various formats
@@ -833,245 +770,114 @@ async def export_conversation(
     - json: Complete conversation data
     - markdown: Human-readable format
     - txt: Plain text format
+    
+    Every format is returned as `{"content": ..., "format": ...}`. With
+    `stream=true`, markdown and txt are instead streamed as the raw document
+    (text/markdown or text/plain), rendered as messages are read.
     """
-    try:
-        chat_service = EnhancedChatService(db)
-        
-        # Get chat session
-        chat = await chat_service.get_chat_session(chat_id, current_user)
-        
-        # Get messages
-        if include_branches:
-            messages = await chat_service.messages_collection.find({
-                "chat_session_id": ObjectId(chat_id)
-            }).sort("timestamp", 1).to_list(length=None)
-        else:
-            messages = await chat_service.get_active_messages(chat_id, current_user)
-            messages = [msg.dict() for msg in messages]
-        
-        export_data = {
-            "chat_session": {
-                "id": str(chat.id),
-                "title": chat.title,
-                "created_at": chat.created_at.isoformat(),
-                "metadata": chat.metadata.dict() if include_metadata else None
-            },
-            "messages": [],
-            "export_metadata": {
-                "exported_at": datetime.utcnow().isoformat(),
-                "exported_by": str(current_user.id),
-                "format": format,
-                "include_metadata": include_metadata,
-                "include_branches": include_branches,
-                "message_count": len(messages)
-            }
-        }
-        
-        # Process messages based on format
-        for msg_doc in messages:
-            if isinstance(msg_doc, dict):
-                msg_dict = msg_doc
-            else:
-                msg_dict = msg_doc.dict()
-            
-            message_export = {
-                "id": str(msg_dict["_id"]) if "_id" in msg_dict else msg_dict["id"],
-                "role": msg_dict["role"],
-                "content": msg_dict["content"],
-                "timestamp": msg_dict["timestamp"] if isinstance(msg_dict["timestamp"], str) else msg_dict["timestamp"].isoformat()
-            }
-            
-            if include_metadata:
-                message_export.update({
-                    "message_type": msg_dict.get("message_type"),
-                    "status": msg_dict.get("status"),
-                    "ai_metadata": msg_dict.get("ai_metadata"),
-                    "formatting": msg_dict.get("formatting"),
-                    "user_interaction": msg_dict.get("user_interaction"),
-                    "conversation_branch": msg_dict.get("conversation_branch")
-                })
-            
-            export_data["messages"].append(message_export)
-        
-        # Format-specific processing
+    chat_oid = _parse_chat_id(chat_id)
+    
+    # Get chat session
+    chat = await chat_service.get_chat_session(chat_id, current_user)
+    
+    query: Dict[str, Any] = {"chat_session_id": chat_oid}
+    if not include_branches:
+        query["active_visible"] = True
+    
+    message_count = await chat_service.messages_collection.count_documents(query)
+    # Iterated lazily; messages are rendered as they arrive from Mongo
+    if format == "json" and include_metadata:
+        projection = _EXPORT_PROJECTION_WITH_METADATA
+    else:
+        projection = _EXPORT_PROJECTIONS[format]
+    cursor = chat_service.messages_collection.find(query, projection).sort("timestamp", 1)
+    
+    # Format-specific processing
+    if format in ("markdown", "txt"):
         if format == "markdown":
-            return {"content": _format_as_markdown(export_data), "format": "markdown"}
-        elif format == "txt":
-            return {"content": _format_as_text(export_data), "format": "txt"}
+            document = _stream_markdown(chat.title, chat.created_at, message_count, cursor)
         else:
-            return {"content": export_data, "format": "json"}
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="An error occurred while exporting conversation"
-        )
-
-@router.get("/search", response_model=MessageHistoryResponse)
-async def search_messages(
-    query: str = Query(..., min_length=3, description="Search query"),
-    chat_id: Optional[str] = Query(None, description="Limit search to specific chat"),
-    pagination: PaginationParams = Depends(get_pagination_params),
-    current_user: User = Depends(get_current_active_user),
-    db: AsyncIOMotorDatabase = Depends(get_db),
-    _: None = Depends(check_general_rate_limit)
-):
-    """
-    Search messages across user's chats
-    """
-    try:
-        chat_service = EnhancedChatService(db)
+            document = _stream_text(chat.title, cursor)
         
-        skip = (pagination.page - 1) * pagination.size
-        
-        # Perform search
-        messages, total = await chat_service.search_messages(
-            current_user, 
-            query, 
-            chat_id=chat_id, 
-            limit=pagination.size, 
-            skip=skip
-        )
-        
-        # Convert to response format
-        message_responses = []
-        for msg in messages:
-            message_response = MessageResponse(
-                id=str(msg.id),
-                chat_session_id=str(msg.chat_session_id),
-                role=msg.role,
-                content=msg.content,
-                message_type=msg.message_type,
-                ai_metadata=msg.ai_metadata.dict() if msg.ai_metadata else None,
-                formatting=msg.formatting.dict() if msg.formatting else None,
-                timestamp=msg.timestamp.isoformat(),
-                created_at=msg.created_at.isoformat()
+        if stream:
+            # Returned responses bypass the injected one, so carry its rate limit headers over
+            return StreamingResponse(
+                document, media_type=_EXPORT_MEDIA_TYPES[format], headers=dict(response.headers)
             )
-            message_responses.append(message_response)
-        
-        return MessageHistoryResponse(
-            messages=message_responses,
-            total=total,
-            page=pagination.page,
-            size=pagination.size,
-            has_next=skip + pagination.size < total
+        return Response(
+            content=orjson.dumps({"content": "".join([part async for part in document]), "format": format}),
+            media_type="application/json",
+            headers=dict(response.headers)
         )
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="An error occurred while searching messages"
-        )
-
-@router.get("/statistics", response_model=Dict[str, Any])
-async def get_user_chat_statistics(
-    current_user: User = Depends(get_current_active_user),
-    db: AsyncIOMotorDatabase = Depends(get_db),
-    _: None = Depends(check_general_rate_limit)
-):
-    """
-    Get comprehensive chat statistics for the user
-    """
-    try:
-        chat_service = EnhancedChatService(db)
-        statistics = await chat_service.get_chat_statistics(current_user)
-        return statistics
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="An error occurred while fetching chat statistics"
-        )
-
-def _format_as_markdown(export_data: Dict[str, Any]) -> str:
-    """Format conversation as markdown"""
-    content = f"# {export_data['chat_session']['title']}\n\n"
-    content += f"**Created:** {export_data['chat_session']['created_at']}\n"
-    content += f"**Messages:** {export_data['export_metadata']['message_count']}\n\n"
-    content += "---\n\n"
     
-    for msg in export_data["messages"]:
-        role = "**You**" if msg["role"] == "user" else "**LawBuddy**"
-        timestamp = msg["timestamp"][:19]  # Remove microseconds
-        content += f"### {role} ({timestamp})\n\n"
-        content += f"{msg['content']}\n\n"
-        
-        if msg.get("ai_metadata") and msg["ai_metadata"].get("token_usage"):
-            tokens = msg["ai_metadata"]["token_usage"]["total_tokens"]
-            cost = msg["ai_metadata"]["token_usage"]["estimated_cost"]
-            content += f"*Tokens: {tokens}, Cost: ${cost:.4f}*\n\n"
-        
-        content += "---\n\n"
+    export_data = {
+        "chat_session": {
+            "id": str(chat.id),
+            "title": chat.title,
+            "created_at": chat.created_at,
+            "metadata": chat.metadata.model_dump(mode="json") if include_metadata else None
+        },
+        "messages": [_export_message(doc, include_metadata) async for doc in cursor],
+        "export_metadata": {
+            "exported_at": datetime.utcnow(),
+            "exported_by": str(current_user.id),
+            "format": format,
+            "include_metadata": include_metadata,
+            "include_branches": include_branches,
+            "message_count": message_count
+        }
+    }
     
-    return content
+    return Response(
+        content=orjson.dumps({"content": export_data, "format": "json"}, default=str),
+        media_type="application/json",
+        headers=dict(response.headers)
+    )
 
-def _format_as_text(export_data: Dict[str, Any]) -> str:
-    """Format conversation as plain text"""
-    content = f"{export_data['chat_session']['title']}\n"
-    content += "="*50 + "\n\n"
-    
-    for msg in export_data["messages"]:
-        role = "You" if msg["role"] == "user" else "LawBuddy"
-        timestamp = msg["timestamp"][:19]
-        content += f"{role} ({timestamp}):\n"
-        content += f"{msg['content']}\n\n"
-        content += "-"*30 + "\n\n"
+def _export_message(msg_doc: Dict[str, Any], include_metadata: bool) -> Dict[str, Any]:
+    """Map a projected message document to its export shape"""
+    if include_metadata:
+        return {
+            "id": str(msg_doc["_id"]),
+            "role": msg_doc["role"],
+            "content": msg_doc["content"],
+            "timestamp": msg_doc["timestamp"],
+            **{field: msg_doc.get(field) for field in _EXPORT_METADATA_FIELDS}
+        }
     
-    return content
+    return {
+        "id": str(msg_doc["_id"]),
+        "role": msg_doc["role"],
+        "content": msg_doc["content"],
+        "timestamp": msg_doc["timestamp"]
+    }
 
-@router.get("/health", response_model=Dict[str, Any])
-async def get_chat_service_health(
-    db: AsyncIOMotorDatabase = Depends(get_db)
-):
-    """
-    Get health status of chat services
-    """
-    try:
-        chat_service = EnhancedChatService(db)
-        ai_service = AIService(db)
-        
-        # Check database connectivity
-        await db.command("ping")
-        
-        # Get service stats
-        pending_count = len(chat_service.pending_messages)
-        streaming_count = len(chat_service.streaming_messages)
-        
-        health_data = {
-            "status": "healthy",
-            "timestamp": datetime.utcnow().isoformat(),
-            "services": {
-                "database": "healthy",
-                "ai_service": "healthy" if ai_service.is_available() else "unavailable",
-                "websocket": "healthy"
-            },
-            "metrics": {
-                "pending_messages": pending_count,
-                "streaming_messages": streaming_count,
-                "cache_entries": len(ai_service.response_cache),
-                "active_contexts": len(ai_service.context_manager.contexts)
-            },
-            "features": {
-                "message_status_tracking": True,
-                "conversation_branching": True,
-                "ai_streaming": True,
-                "token_management": True,
-                "cost_tracking": True,
-                "response_caching": True
-            }
-        }
+async def _stream_markdown(title: str, created_at: datetime, message_count: int, cursor):
+    """Render conversation as markdown, one message per chunk"""
+    yield (
+        f"# {title}\n\n"
+        f"**Created:** {created_at.isoformat()}\n"
+        f"**Messages:** {message_count}\n\n"
+        "---\n\n"
+    )
+    
+    async for msg in cursor:
+        role = _MARKDOWN_ROLE_LABELS.get(msg["role"], "**LawBuddy**")
+        timestamp = msg["timestamp"].isoformat()[:19]  # Remove microseconds
+        parts = [f"### {role} ({timestamp})\n\n", f"{msg['content']}\n\n"]
         
-        return health_data
+        token_usage = (msg.get("ai_metadata") or {}).get("token_usage")
+        if token_usage:
+            parts.append(f"*Tokens: {token_usage['total_tokens']}, Cost: ${token_usage['estimated_cost']:.4f}*\n\n")
         
-    except Exception as e:
-        return {
-            "status": "unhealthy",
-            "error": str(e),
-            "timestamp": datetime.utcnow().isoformat()
-        }
\ No newline at end of file
+        parts.append("---\n\n")
+        yield "".join(parts)
+
+async def _stream_text(title: str, cursor):
+    """Render conversation as plain text, one message per chunk"""
+    yield f"{title}\n" + "="*50 + "\n\n"
+    
+    async for msg in cursor:
+        role = _TEXT_ROLE_LABELS.get(msg["role"], "LawBuddy")
+        timestamp = msg["timestamp"].isoformat()[:19]
+        yield f"{role} ({timestamp}):\n{msg['content']}\n\n" + "-"*30 + "\n\n"
@@ -1,11 +1,19 @@
-import json
 import asyncio
 import logging
+from datetime import datetime
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException, Query
-from typing import Dict, Optional
+from fastapi.responses import ORJSONResponse
+from typing import Awaitable, Callable, Dict, Optional
+from motor.motor_asyncio import AsyncIOMotorDatabase
 
-from app.api.deps import get_current_active_user, get_db, generate_connection_id
-from app.websocket.manager import connection_manager, websocket_handler
+from app.api.deps import (
+    get_current_active_user, get_db, get_auth_service, get_chat_service, get_ai_service,
+    generate_connection_id, check_database_health, check_ai_service_health, database_health_error
+)
+from app.websocket.manager import (
+    connection_manager, websocket_handler, coalesce_chunks, constant_frame, response_frame, FrameDecodeError
+)
+from app.services.auth_service import AuthService
 from app.services.chat_service import EnhancedChatService
 from app.services.ai_service import AIService
 from app.schemas.chat import MessageCreate
@@ -16,10 +24,35 @@ from app.models.user import User
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-async def get_websocket_user(token: str, db):
+# Invariant replies, encoded once
+EMPTY_CONTENT_ERROR = constant_frame(WebSocketResponse(type="error", error="Message content cannot be empty"))
+NO_ACTIVE_GENERATION_ERROR = constant_frame(WebSocketResponse(type="error", error="No active generation found to cancel"))
+
+# Fields sent for each message of a messages_list frame
+MESSAGES_LIST_PROJECTION = {
+    "chat_session_id": 1,
+    "role": 1,
+    "content": 1,
+    "message_type": 1,
+    "status": 1,
+    "timestamp": 1,
+    "created_at": 1,
+    "ai_metadata": 1,
+    "formatting": 1,
+    "user_interaction": 1
+}
+_OPTIONAL_MESSAGE_FIELDS = ("ai_metadata", "formatting", "user_interaction")
+
+def _message_row(doc: dict) -> dict:
+    """messages_list entry from a projected message document"""
+    doc["id"] = doc.pop("_id")
+    for field in _OPTIONAL_MESSAGE_FIELDS:
+        if not doc.get(field):
+            doc.pop(field, None)
+    return doc
+
+async def get_websocket_user(token: str, auth_service: AuthService):
     """Authenticate user for WebSocket connection"""
-    from app.services.auth_service import AuthService
-    auth_service = AuthService(db)
     try:
         return await auth_service.get_current_user(token)
     except Exception as e:
@@ -68,12 +101,14 @@ async def enhanced_websocket_chat_endpoint(
     - error: Error message
     """
     
-    db = await get_db()
+    # App-scoped services: one Motor pool, and stream tracking shared with the HTTP routes
+    chat_service = get_chat_service(websocket)
+    ai_service = get_ai_service(websocket)
     connection_id = generate_connection_id()
     
     try:
         # Authenticate user
-        user = await get_websocket_user(token, db)
+        user = await get_websocket_user(token, get_auth_service(websocket))
         
         # Accept connection
         await connection_manager.connect(websocket, user, connection_id)
@@ -82,83 +117,37 @@ async def enhanced_websocket_chat_endpoint(
         if chat_id:
             await connection_manager.join_chat_room(chat_id, str(user.id), connection_id)
         
-        # Initialize enhanced services
-        chat_service = EnhancedChatService(db)
-        ai_service = AIService(db)
-        
         # Track active generations for this connection
-        active_generations: Dict[str, str] = {}  # stream_id -> generation_task_id
+        active_generations: Dict[str, asyncio.Task] = {}  # stream_id -> generation task
         
         # Main message loop
         while True:
             try:
-                # Receive message
-                data = await websocket.receive_text()
-                message_data = json.loads(data)
+                # Receive message (JSON text, or msgpack bytes if negotiated)
+                message_data = await connection_manager.receive(websocket)
                 
                 message_type = message_data.get("type")
-                logger.info(f"Received WebSocket message: {message_type} from user {user.email}")
+                # Per-frame, so debug level and formatted only when enabled
+                logger.debug("Received WebSocket message: %s from user %s", message_type, user.email)
                 
-                if message_type == "send_message":
-                    await handle_send_message(
-                        websocket, user, connection_id, message_data,
-                        chat_service, ai_service, active_generations
-                    )
-                    
-                elif message_type == "regenerate_message":
-                    await handle_regenerate_message(
+                handler = MESSAGE_HANDLERS.get(message_type) if isinstance(message_type, str) else None
+                if handler is not None:
+                    await handler(
                         websocket, user, connection_id, message_data,
                         chat_service, ai_service, active_generations
                     )
-                    
-                elif message_type == "edit_message":
-                    await handle_edit_message(
-                        websocket, user, connection_id, message_data,
-                        chat_service
-                    )
-                    
-                elif message_type == "cancel_generation":
-                    await handle_cancel_generation(
-                        websocket, user, message_data, active_generations
-                    )
-                    
-                elif message_type == "switch_branch":
-                    await handle_switch_branch(
-                        websocket, user, message_data, chat_service
-                    )
-                    
-                elif message_type == "get_branches":
-                    await handle_get_branches(
-                        websocket, user, message_data, chat_service
-                    )
-                    
-                elif message_type == "get_messages":
-                    await handle_get_messages(
-                        websocket, user, message_data, chat_service
-                    )
-                    
-                elif message_type == "create_chat":
-                    await handle_create_chat(
-                        websocket, user, message_data, chat_service
-                    )
-                    
-                elif message_type == "get_chat_list":
-                    await handle_get_chat_list(
-                        websocket, user, message_data, chat_service
-                    )
-                    
                 else:
                     # Handle other message types (join, leave, typing, ping, etc.)
                     await websocket_handler.handle_message(
                         websocket, user, connection_id, message_data
                     )
                     
-            except json.JSONDecodeError:
+            except FrameDecodeError as e:
                 await connection_manager.send_to_connection(
                     websocket,
                     WebSocketResponse(
                         type="error",
-                        error="Invalid JSON message format"
+                        error=str(e)
                     )
                 )
             except Exception as e:
@@ -176,14 +165,10 @@ async def enhanced_websocket_chat_endpoint(
         await websocket.close(code=4001, reason=f"Authentication failed: {e.detail}")
         
     except WebSocketDisconnect:
-        # Client disconnected - cancel any active generations
-        for stream_id, task_id in active_generations.items():
-            try:
-                # Cancel any pending AI generations
-                chat_service = EnhancedChatService(db)
-                await chat_service.fail_message(stream_id, "Connection disconnected")
-            except Exception as e:
-                logger.error(f"Error canceling generation on disconnect: {e}")
+        # Client disconnected - cancel any active generations; each marks its
+        # own message failed as it unwinds
+        for task in list(active_generations.values()):
+            task.cancel("Connection disconnected")
         
         connection_manager.disconnect(connection_id)
         logger.info(f"WebSocket client disconnected: {connection_id}")
@@ -201,7 +186,7 @@ async def handle_send_message(
     message_data: dict,
     chat_service: EnhancedChatService,
     ai_service: AIService,
-    active_generations: Dict[str, str]
+    active_generations: Dict[str, asyncio.Task]
 ):
     """Handle sending a new message with AI response generation"""
     
@@ -213,13 +198,7 @@ async def handle_send_message(
         
         # Validate message
         if not content or not content.strip():
-            await connection_manager.send_to_connection(
-                websocket,
-                WebSocketResponse(
-                    type="error",
-                    error="Message content cannot be empty"
-                )
-            )
+            await connection_manager.send_frame(websocket, EMPTY_CONTENT_ERROR)
             return
         
         # Create user message
@@ -228,13 +207,20 @@ async def handle_send_message(
             role=MessageRole.USER
         )
         
-        # Add user message to database (completes immediately)
-        user_message = await chat_service.add_message_with_status_tracking(
-            chat_id, user, user_message_create
-        )
+        # With AI available the user message and the pending reply are
+        # written together, so generation needs no insert of its own
+        ai_available = ai_service.is_available()
+        if ai_available:
+            user_message, ai_message = await chat_service.create_message_pair(
+                chat_id, user, user_message_create
+            )
+        else:
+            user_message = await chat_service.add_message_with_status_tracking(
+                chat_id, user, user_message_create
+            )
         
         # Send user message confirmation
-        await connection_manager.send_to_connection(
+        confirmation = connection_manager.send_to_connection(
             websocket,
             WebSocketResponse(
                 type="message_sent",
@@ -250,7 +236,8 @@ async def handle_send_message(
         )
         
         # Broadcast user message to other users in chat (if any)
-        await connection_manager.broadcast_to_chat(
+        user_id = str(user.id)
+        broadcast = connection_manager.broadcast_to_chat(
             chat_id,
             WebSocketResponse(
                 type="new_message",
@@ -259,20 +246,30 @@ async def handle_send_message(
                 metadata={
                     "chat_id": chat_id,
                     "role": "user",
-                    "user_id": str(user.id),
+                    "user_id": user_id,
                     "status": "complete",
                     "timestamp": user_message.timestamp.isoformat()
                 }
             ),
-            exclude_user=str(user.id)
+            exclude_user=user_id
         )
         
-        # Generate AI response if AI service is available
-        if ai_service.is_available():
-            await generate_ai_response_with_streaming(
-                chat_id, content, user, chat_service, ai_service, active_generations, response_format
+        # Only enqueues, so the sender's confirmation precedes every stream frame
+        await confirmation
+        
+        if ai_available:
+            # Generation starts before the room broadcast is awaited, which with
+            # several API processes includes a Redis publish
+            start_generation(
+                active_generations, ai_message.stream_id,
+                generate_ai_response_with_streaming(
+                    chat_id, content, user, chat_service, ai_service,
+                    ai_message.stream_id, str(ai_message.id), response_format
+                )
             )
+            await broadcast
         else:
+            await broadcast
             await connection_manager.send_to_connection(
                 websocket,
                 WebSocketResponse(
@@ -299,7 +296,7 @@ async def handle_regenerate_message(
     message_data: dict,
     chat_service: EnhancedChatService,
     ai_service: AIService,
-    active_generations: Dict[str, str]
+    active_generations: Dict[str, asyncio.Task]
 ):
     """Handle message regeneration"""
     
@@ -339,9 +336,12 @@ async def handle_regenerate_message(
                     break
             
             if user_message:
-                await generate_ai_response_with_streaming(
-                    chat_id, user_message.content, user, chat_service, ai_service, 
-                    active_generations, response_format, regenerated_message.stream_id
+                start_generation(
+                    active_generations, regenerated_message.stream_id,
+                    generate_ai_response_with_streaming(
+                        chat_id, user_message.content, user, chat_service, ai_service,
+                        regenerated_message.stream_id, str(regenerated_message.id), response_format
+                    )
                 )
             
     except Exception as e:
@@ -399,7 +399,7 @@ async def handle_cancel_generation(
     websocket: WebSocket,
     user: User,
     message_data: dict,
-    active_generations: Dict[str, str]
+    active_generations: Dict[str, asyncio.Task]
 ):
     """Handle canceling AI generation"""
     
@@ -407,12 +407,8 @@ async def handle_cancel_generation(
         stream_id = message_data.get("stream_id")
         
         if stream_id and stream_id in active_generations:
-            # Cancel the generation task
-            task_id = active_generations.pop(stream_id)
-            
-            # Mark message as cancelled
-            chat_service = EnhancedChatService(await get_db())
-            await chat_service.fail_message(stream_id, "Generation cancelled by user")
+            # Interrupts the generation at its next await; it marks its message failed
+            active_generations.pop(stream_id).cancel("Generation cancelled by user")
             
             await connection_manager.send_to_connection(
                 websocket,
@@ -422,13 +418,7 @@ async def handle_cancel_generation(
                 )
             )
         else:
-            await connection_manager.send_to_connection(
-                websocket,
-                WebSocketResponse(
-                    type="error",
-                    error="No active generation found to cancel"
-                )
-            )
+            await connection_manager.send_frame(websocket, NO_ACTIVE_GENERATION_ERROR)
             
     except Exception as e:
         logger.error(f"Error handling cancel generation: {e}")
@@ -467,6 +457,7 @@ async def handle_switch_branch(
             )
             
             # Broadcast to other users in the chat
+            user_id = str(user.id)
             await connection_manager.broadcast_to_chat(
                 chat_id,
                 WebSocketResponse(
@@ -474,10 +465,10 @@ async def handle_switch_branch(
                     metadata={
                         "chat_id": chat_id,
                         "branch_id": branch_id,
-                        "switched_by": str(user.id)
+                        "switched_by": user_id
                     }
                 ),
-                exclude_user=str(user.id)
+                exclude_user=user_id
             )
         else:
             await connection_manager.send_to_connection(
@@ -542,35 +533,16 @@ async def handle_get_messages(
     
     try:
         chat_id = message_data["chat_session_id"]
-        limit = message_data.get("limit", 50)
-        skip = message_data.get("skip", 0)
+        limit = min(max(int(message_data.get("limit", 50)), 1), 100)
+        skip = max(int(message_data.get("skip", 0)), 0)
         branch_id = message_data.get("branch_id")
         
-        # Get messages
-        messages = await chat_service.get_active_messages(chat_id, user)
-        
-        # Convert to dict format
-        message_list = []
-        for msg in messages[skip:skip+limit]:
-            message_dict = {
-                "id": str(msg.id),
-                "chat_session_id": str(msg.chat_session_id),
-                "role": msg.role,
-                "content": msg.content,
-                "message_type": msg.message_type,
-                "status": msg.status,
-                "timestamp": msg.timestamp.isoformat(),
-                "created_at": msg.created_at.isoformat()
-            }
-            
-            if msg.ai_metadata:
-                message_dict["ai_metadata"] = msg.ai_metadata.dict()
-            if msg.formatting:
-                message_dict["formatting"] = msg.formatting.dict()
-            if msg.user_interaction:
-                message_dict["user_interaction"] = msg.user_interaction.dict()
-            
-            message_list.append(message_dict)
+        # Only the requested page leaves Mongo. Stored documents go out as they
+        # are: ObjectIds and datetimes are encoded with the frame
+        messages, total = await chat_service.get_active_messages_page(
+            chat_id, user, skip, limit, MESSAGES_LIST_PROJECTION
+        )
+        message_list = [_message_row(doc) for doc in messages]
         
         await connection_manager.send_to_connection(
             websocket,
@@ -579,7 +551,7 @@ async def handle_get_messages(
                 metadata={
                     "chat_id": chat_id,
                     "messages": message_list,
-                    "total": len(messages),
+                    "total": total,
                     "limit": limit,
                     "skip": skip
                 }
@@ -695,56 +667,143 @@ async def handle_get_chat_list(
             )
         )
 
+# Receive-loop dispatch by message type. Every entry takes the loop's full
+# argument list: (websocket, user, connection_id, message_data, chat_service,
+# ai_service, active_generations); handlers needing less are adapted here.
+MESSAGE_HANDLERS: Dict[str, Callable[..., Awaitable[None]]] = {
+    "send_message": handle_send_message,
+    "regenerate_message": handle_regenerate_message,
+    "edit_message": lambda ws, user, conn_id, data, chat_service, ai_service, active: handle_edit_message(
+        ws, user, conn_id, data, chat_service
+    ),
+    "cancel_generation": lambda ws, user, conn_id, data, chat_service, ai_service, active: handle_cancel_generation(
+        ws, user, data, active
+    ),
+    "switch_branch": lambda ws, user, conn_id, data, chat_service, ai_service, active: handle_switch_branch(
+        ws, user, data, chat_service
+    ),
+    "get_branches": lambda ws, user, conn_id, data, chat_service, ai_service, active: handle_get_branches(
+        ws, user, data, chat_service
+    ),
+    "get_messages": lambda ws, user, conn_id, data, chat_service, ai_service, active: handle_get_messages(
+        ws, user, data, chat_service
+    ),
+    "create_chat": lambda ws, user, conn_id, data, chat_service, ai_service, active: handle_create_chat(
+        ws, user, data, chat_service
+    ),
+    "get_chat_list": lambda ws, user, conn_id, data, chat_service, ai_service, active: handle_get_chat_list(
+        ws, user, data, chat_service
+    ),
+}
+
+async def _run_to_completion(step: Awaitable):
+    """Finish a step even if the generation is cancelled meanwhile; cancels arriving during it are dropped"""
+    # Once completion starts the reply is final. Interrupting it would leave the
+    # message written but its chat metadata, caches and clients never updated
+    inner = asyncio.ensure_future(step)
+    while True:
+        try:
+            return await asyncio.shield(inner)
+        except asyncio.CancelledError:
+            if inner.cancelled():
+                raise
+            asyncio.current_task().uncancel()
+
+async def _broadcast(chat_id: str, type: str, **fields):
+    """Send a server-built frame to a chat room; fields are trusted, so not validated"""
+    await connection_manager.broadcast_to_chat(chat_id, WebSocketResponse.model_construct(type=type, **fields))
+
+async def _complete_stream(
+    chat_service: EnhancedChatService,
+    chat_id: str,
+    stream_id: str,
+    message_id: str,
+    content: str,
+    ai_metadata,
+    formatting=None
+):
+    """Persist a finished reply and announce it to the chat room"""
+    await _run_to_completion(chat_service.complete_streaming_message(
+        stream_id, content, ai_metadata, formatting
+    ))
+    
+    # The metadata models are serialized along with the frame in one pass
+    # rather than dumped to dicts first
+    await _broadcast(
+        chat_id,
+        "ai_stream_complete",
+        content=content,
+        message_id=message_id,
+        metadata={
+            "chat_id": chat_id,
+            "stream_id": stream_id,
+            "ai_metadata": ai_metadata,
+            "formatting": formatting,
+            "is_streaming": False
+        }
+    )
+
+async def _fail_stream(
+    chat_service: EnhancedChatService,
+    chat_id: str,
+    stream_id: str,
+    message_id: str,
+    error: str,
+    reason: Optional[str] = None
+):
+    """Mark a reply failed (with `reason`, defaulting to `error`) and announce the error to the chat room"""
+    await chat_service.fail_message(stream_id, reason or error)
+    
+    await _broadcast(
+        chat_id,
+        "ai_stream_error",
+        error=error,
+        message_id=message_id,
+        metadata={
+            "chat_id": chat_id,
+            "stream_id": stream_id
+        }
+    )
+
+def start_generation(
+    active_generations: Dict[str, asyncio.Task],
+    stream_id: str,
+    generation: Awaitable[None]
+) -> asyncio.Task:
+    """Run a generation as its own task, so the receive loop stays free for e.g. cancel_generation"""
+    task = asyncio.create_task(generation)
+    active_generations[stream_id] = task
+    
+    def untrack(done: asyncio.Task):
+        if active_generations.get(stream_id) is done:
+            del active_generations[stream_id]
+    
+    task.add_done_callback(untrack)
+    return task
+
 async def generate_ai_response_with_streaming(
     chat_id: str,
     user_message: str,
     user: User,
     chat_service: EnhancedChatService,
     ai_service: AIService,
-    active_generations: Dict[str, str],
-    response_format: ResponseFormat = ResponseFormat.MARKDOWN,
-    stream_id: Optional[str] = None
+    stream_id: str,
+    message_id: str,
+    response_format: ResponseFormat = ResponseFormat.MARKDOWN
 ):
-    """Generate AI response with real-time streaming"""
+    """Stream an AI response into an already created pending message"""
     
     try:
-        # Create pending AI message if stream_id not provided
-        if not stream_id:
-            ai_message_create = MessageCreate(
-                content="",
-                role=MessageRole.ASSISTANT
-            )
-            
-            ai_message = await chat_service.create_pending_message(
-                chat_id, user, ai_message_create
-            )
-            stream_id = ai_message.stream_id
-            message_id = str(ai_message.id)
-        else:
-            # Get existing message
-            pending_info = chat_service.pending_messages.get(stream_id) or chat_service.streaming_messages.get(stream_id)
-            if pending_info:
-                message_id = pending_info["message_id"]
-            else:
-                logger.error(f"No message found for stream_id: {stream_id}")
-                return
-        
-        # Track this generation
-        generation_task_id = f"gen_{stream_id}"
-        active_generations[stream_id] = generation_task_id
-        
         # Notify that AI response started
-        await connection_manager.broadcast_to_chat(
+        await _broadcast(
             chat_id,
-            WebSocketResponse(
-                type="ai_stream_start",
-                message_id=message_id,
-                metadata={
-                    "chat_id": chat_id,
-                    "stream_id": stream_id,
-                    "response_format": response_format
-                }
-            )
+            "ai_stream_start",
+            message_id=message_id,
+            metadata={
+                "chat_id": chat_id,
+                "stream_id": stream_id,
+                "response_format": response_format
+            }
         )
         
         # Start streaming
@@ -752,26 +811,21 @@ async def generate_ai_response_with_streaming(
         
         # Check if streaming is available
         if hasattr(ai_service, 'generate_streaming_response'):
-            # Use streaming response
-            async for chunk_data in ai_service.generate_streaming_response(
+            # Use streaming response, batching chunks into fewer frames and writes
+            async for chunk_data in coalesce_chunks(ai_service.generate_streaming_response(
                 user_message, chat_id, user, response_format
-            ):
-                # Check if generation was cancelled
-                if stream_id not in active_generations:
-                    await chat_service.fail_message(stream_id, "Generation cancelled")
-                    return
-                
+            )):
                 if chunk_data["type"] == "chunk":
                     chunk_text = chunk_data["content"]
                     
-                    # Update streaming message
-                    await chat_service.update_streaming_message(stream_id, chunk_text)
-                    
-                    # Broadcast chunk to chat room
+                    # Broadcast chunk to chat room; chunks are not persisted one by one,
+                    # the message is marked streaming and completion writes the final text.
+                    # Built as a plain dict rather than a model, and encoded once per
+                    # wire format however many sockets are in the room
                     await connection_manager.broadcast_to_chat(
                         chat_id,
-                        WebSocketResponse(
-                            type="ai_stream_chunk",
+                        response_frame(
+                            "ai_stream_chunk",
                             content=chunk_text,
                             message_id=message_id,
                             metadata={
@@ -783,50 +837,14 @@ async def generate_ai_response_with_streaming(
                     )
                     
                 elif chunk_data["type"] == "complete":
-                    # Complete the streaming message
-                    await chat_service.complete_streaming_message(
-                        stream_id, chunk_data["content"], chunk_data["metadata"], None
+                    await _complete_stream(
+                        chat_service, chat_id, stream_id, message_id,
+                        chunk_data["content"], chunk_data["metadata"]
                     )
-                    
-                    # Send completion signal
-                    await connection_manager.broadcast_to_chat(
-                        chat_id,
-                        WebSocketResponse(
-                            type="ai_stream_complete",
-                            content=chunk_data["content"],
-                            message_id=message_id,
-                            metadata={
-                                "chat_id": chat_id,
-                                "stream_id": stream_id,
-                                "ai_metadata": chunk_data["metadata"].dict() if chunk_data["metadata"] else None,
-                                "is_streaming": False
-                            }
-                        )
-                    )
-                    
-                    # Remove from active generations
-                    active_generations.pop(stream_id, None)
                     break
                     
                 elif chunk_data["type"] == "error":
-                    # Handle error
-                    await chat_service.fail_message(stream_id, chunk_data["content"])
-                    
-                    await connection_manager.broadcast_to_chat(
-                        chat_id,
-                        WebSocketResponse(
-                            type="ai_stream_error",
-                            error=chunk_data["content"],
-                            message_id=message_id,
-                            metadata={
-                                "chat_id": chat_id,
-                                "stream_id": stream_id
-                            }
-                        )
-                    )
-                    
-                    # Remove from active generations
-                    active_generations.pop(stream_id, None)
+                    await _fail_stream(chat_service, chat_id, stream_id, message_id, chunk_data["content"])
                     break
         else:
             # Fallback to non-streaming response
@@ -839,71 +857,28 @@ async def generate_ai_response_with_streaming(
             )
             
             if ai_response["success"]:
-                # Complete the streaming message
-                await chat_service.complete_streaming_message(
-                    stream_id, ai_response["content"], ai_response["metadata"], ai_response.get("formatting")
+                await _complete_stream(
+                    chat_service, chat_id, stream_id, message_id,
+                    ai_response["content"], ai_response["metadata"], ai_response.get("formatting")
                 )
-                
-                # Send completion signal
-                await connection_manager.broadcast_to_chat(
-                    chat_id,
-                    WebSocketResponse(
-                        type="ai_stream_complete",
-                        content=ai_response["content"],
-                        message_id=message_id,
-                        metadata={
-                            "chat_id": chat_id,
-                            "stream_id": stream_id,
-                            "ai_metadata": ai_response["metadata"].dict() if ai_response["metadata"] else None,
-                            "formatting": ai_response.get("formatting").dict() if ai_response.get("formatting") else None,
-                            "is_streaming": False
-                        }
-                    )
-                )
-                
-                # Remove from active generations
-                active_generations.pop(stream_id, None)
-                    
             else:
-                # Handle error
-                await chat_service.fail_message(stream_id, ai_response.get("content", "AI generation failed"))
-                
-                await connection_manager.broadcast_to_chat(
-                    chat_id,
-                    WebSocketResponse(
-                        type="ai_stream_error",
-                        error=ai_response.get("content", "AI generation failed"),
-                        message_id=message_id,
-                        metadata={
-                            "chat_id": chat_id,
-                            "stream_id": stream_id
-                        }
-                    )
+                await _fail_stream(
+                    chat_service, chat_id, stream_id, message_id,
+                    ai_response.get("content", "AI generation failed")
                 )
                 
-                # Remove from active generations
-                active_generations.pop(stream_id, None)
-                
+    except asyncio.CancelledError as e:
+        # Cancelled by the user or by the connection closing
+        await chat_service.fail_message(stream_id, e.args[0] if e.args else "Generation cancelled")
+        raise
+        
     except Exception as e:
         logger.error(f"Error in AI response generation: {e}")
         
-        if stream_id:
-            await chat_service.fail_message(stream_id, f"Generation error: {str(e)}")
-            
-            await connection_manager.broadcast_to_chat(
-                chat_id,
-                WebSocketResponse(
-                    type="ai_stream_error",
-                    error=f"AI generation failed: {str(e)}",
-                    metadata={
-                        "chat_id": chat_id,
-                        "stream_id": stream_id
-                    }
-                )
-            )
-            
-            # Remove from active generations
-            active_generations.pop(stream_id, None)
+        await _fail_stream(
+            chat_service, chat_id, stream_id, message_id,
+            f"AI generation failed: {str(e)}", reason=f"Generation error: {str(e)}"
+        )
 
 # Additional REST endpoints for WebSocket management
 
@@ -941,13 +916,12 @@ async def get_websocket_stats():
 async def broadcast_to_chat(
     chat_id: str,
     message: dict,
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_current_active_user),
+    chat_service: EnhancedChatService = Depends(get_chat_service)
 ):
     """Broadcast a message to all users in a chat room (admin/testing only)"""
     try:
         # Verify user has access to this chat
-        db = await get_db()
-        chat_service = EnhancedChatService(db)
         await chat_service.get_chat_session(chat_id, current_user)
         
         # Broadcast message
@@ -1022,7 +996,8 @@ async def get_active_connections(
 ):
     """Get information about active WebSocket connections"""
     try:
-        user_connections = connection_manager.get_user_connection_count(str(current_user.id))
+        user_id = str(current_user.id)
+        user_connections = connection_manager.get_user_connection_count(user_id)
         total_connections = connection_manager.get_total_connections()
         
         return {
@@ -1030,7 +1005,7 @@ async def get_active_connections(
             "data": {
                 "user_connections": user_connections,
                 "total_connections": total_connections,
-                "user_id": str(current_user.id),
+                "user_id": user_id,
                 "is_connected": user_connections > 0
             }
         }
@@ -1042,21 +1017,28 @@ async def get_active_connections(
         )
 
 @router.post("/health")
-async def websocket_health_check():
+async def websocket_health_check(
+    db: AsyncIOMotorDatabase = Depends(get_db),
+    ai_service: AIService = Depends(get_ai_service)
+):
     """WebSocket service health check"""
     try:
         stats = connection_manager.get_stats()
         
-        # Check if services are responsive
-        db = await get_db()
-        await db.command("ping")
+        # Check if services are responsive; probes are shared with the other
+        # health endpoints and reused for a short window
+        if not await check_database_health(db):
+            return {
+                "status": "unhealthy",
+                "error": database_health_error(),
+                "timestamp": datetime.utcnow().isoformat()
+            }
         
-        ai_service = AIService(db)
-        ai_available = ai_service.is_available()
+        ai_available = await check_ai_service_health(ai_service)
         
         health_data = {
             "status": "healthy",
-            "timestamp": "2024-12-20T12:00:00Z",  # Use actual timestamp in production
+            "timestamp": datetime.utcnow().isoformat(),
             "websocket": {
                 "status": "operational",
                 "active_connections": stats["total_connections"],
@@ -1084,7 +1066,7 @@ async def websocket_health_check():
         return {
             "status": "unhealthy",
             "error": str(e),
-            "timestamp": "2024-12-20T12:00:00Z"
+            "timestamp": datetime.utcnow().isoformat()
         }
 
 @router.delete("/connections/{connection_id}")
@@ -1129,13 +1111,12 @@ async def force_disconnect(
 @router.get("/chat/{chat_id}/users")
 async def get_chat_users(
     chat_id: str,
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_current_active_user),
+    chat_service: EnhancedChatService = Depends(get_chat_service)
 ):
     """Get list of users currently active in a chat"""
     try:
         # Verify user has access to this chat
-        db = await get_db()
-        chat_service = EnhancedChatService(db)
         await chat_service.get_chat_session(chat_id, current_user)
         
         # Get active users in chat
@@ -1163,18 +1144,18 @@ async def get_chat_users(
 async def send_typing_indicator(
     chat_id: str,
     is_typing: bool,
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_current_active_user),
+    chat_service: EnhancedChatService = Depends(get_chat_service)
 ):
     """Send typing indicator to chat (REST alternative to WebSocket)"""
     try:
         # Verify user has access to this chat
-        db = await get_db()
-        chat_service = EnhancedChatService(db)
         await chat_service.get_chat_session(chat_id, current_user)
         
         # Send typing indicator
+        user_id = str(current_user.id)
         await connection_manager.handle_typing_indicator(
-            chat_id, str(current_user.id), is_typing
+            chat_id, user_id, is_typing
         )
         
         return {
@@ -1182,7 +1163,7 @@ async def send_typing_indicator(
             "message": f"Typing indicator {'started' if is_typing else 'stopped'}",
             "data": {
                 "chat_id": chat_id,
-                "user_id": str(current_user.id),
+                "user_id": user_id,
                 "is_typing": is_typing
             }
         }
@@ -1205,22 +1186,23 @@ async def debug_connections():
                 user_id: list(connections.keys()) 
                 for user_id, connections in connection_manager.active_connections.items()
             },
-            "chat_rooms": connection_manager.chat_rooms,
-            "connection_users": connection_manager.connection_users,
-            "typing_indicators": {
-                chat_id: {
-                    user_id: timestamp.isoformat() 
-                    for user_id, timestamp in users.items()
-                }
-                for chat_id, users in connection_manager.typing_indicators.items()
+            "chat_rooms": {
+                chat_id: {user_id: sorted(connection_ids) for user_id, connection_ids in members.items()}
+                for chat_id, members in connection_manager.chat_rooms.items()
             },
+            # orjson writes these directly (datetimes included) when the
+            # response is rendered, without per-entry copies
+            "connection_users": connection_manager.connection_users,
+            "typing_indicators": connection_manager.typing_indicators,
             "stats": connection_manager.get_stats()
         }
         
-        return {
+        # Returned as a response so FastAPI does not walk every entry through
+        # jsonable_encoder before encoding
+        return ORJSONResponse({
             "success": True,
             "data": debug_info
-        }
+        })
         
     except Exception as e:
         raise HTTPException(
@@ -1245,7 +1227,7 @@ async def simulate_message(
                 metadata={
                     "chat_id": chat_id,
                     "simulated_by": str(current_user.id),
-                    "timestamp": "2024-12-20T12:00:00Z"
+                    "timestamp": datetime.utcnow().isoformat()
                 }
             )
         )
@@ -10,6 +10,9 @@ class Settings(BaseSettings):
     APP_NAME: str = "LawBuddy API"
     APP_VERSION: str = "1.0.0"
     DEBUG: bool = False
+    # Log event loop callbacks that block for longer than this many seconds
+    # (asyncio debug mode; adds overhead, for development only)
+    ASYNC_DEBUG_SLOW_CALLBACK: Optional[float] = None
     
     # Server Settings
     HOST: str = "0.0.0.0"
@@ -24,6 +27,10 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    PASSWORD_RESET_EXPIRE_MINUTES: int = 30
+    
+    # Admin accounts (email-based until a role field exists)
+    ADMIN_EMAILS: list = ["admin@lawbuddy.com", "support@lawbuddy.com"]
     
     # AI Settings
     GEMINI_API_KEY: Optional[str] = None
@@ -42,6 +49,10 @@ class Settings(BaseSettings):
     RATE_LIMIT_REQUESTS: int = 100
     RATE_LIMIT_WINDOW: int = 3600  # 1 hour
     
+    # Redis Settings (optional - shared rate limiting across workers)
+    REDIS_URL: Optional[str] = None
+    REDIS_MAX_CONNECTIONS: int = 50
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
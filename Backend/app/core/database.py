@@ -1,5 +1,7 @@
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from pymongo import IndexModel, ASCENDING, DESCENDING, TEXT
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime
 from app.core.config import settings
 import logging
 import asyncio
@@ -72,10 +74,19 @@ async def close_mongo_connection():
         db.client.close()
         logger.info("Disconnected from MongoDB")
 
-async def get_database() -> AsyncIOMotorDatabase:
+def get_database() -> AsyncIOMotorDatabase:
     """Get database instance"""
     return db.database
 
+MESSAGES_TEXT_INDEX = "messages_user_text"
+
+async def _drop_stale_text_index(collection, keep: str):
+    """A collection allows one text index, so an older definition must go first"""
+    for name, info in (await collection.index_information()).items():
+        if name != keep and any(kind == TEXT for _, kind in info["key"]):
+            logger.info(f"Dropping superseded text index {name} on {collection.name}")
+            await collection.drop_index(name)
+
 async def create_indexes():
     """Create database indexes for optimal performance"""
     try:
@@ -93,7 +104,10 @@ async def create_indexes():
         # Chat sessions collection indexes
         chat_sessions_indexes = [
             IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)]),
-            IndexModel([("user_id", ASCENDING), ("status", ASCENDING)]),
+            # Chat list: a status filter is an equality prefix to the (updated_at, _id)
+            # keyset sort; without one, status $ne deleted is checked on the second index
+            IndexModel([("user_id", ASCENDING), ("status", ASCENDING), ("updated_at", DESCENDING), ("_id", DESCENDING)]),
+            IndexModel([("user_id", ASCENDING), ("updated_at", DESCENDING), ("_id", DESCENDING)]),
             IndexModel([("metadata.legal_categories", ASCENDING)]),
             IndexModel([("tags", ASCENDING)]),
             IndexModel([("updated_at", DESCENDING)])
@@ -102,20 +116,69 @@ async def create_indexes():
         
         # Messages collection indexes
         messages_indexes = [
-            IndexModel([("chat_session_id", ASCENDING), ("timestamp", DESCENDING)]),
+            IndexModel([("chat_session_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)]),
+            IndexModel([("chat_session_id", ASCENDING), ("active_visible", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)]),
             IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING)]),
             IndexModel([("role", ASCENDING), ("timestamp", DESCENDING)]),
-            IndexModel([("content", TEXT), ("ai_metadata.legal_sources", TEXT)])
+            # Search always filters on user_id; as an equality prefix it limits the
+            # text index scan to one user's messages
+            IndexModel(
+                [("user_id", ASCENDING), ("content", TEXT), ("ai_metadata.legal_sources", TEXT)],
+                name=MESSAGES_TEXT_INDEX,
+                default_language="english"
+            )
         ]
+        await _drop_stale_text_index(database.messages, MESSAGES_TEXT_INDEX)
         await database.messages.create_indexes(messages_indexes)
         
+        # Password reset tokens (stored as SHA-256 digests, expired by TTL)
+        password_resets_indexes = [
+            IndexModel([("token_hash", ASCENDING)], unique=True),
+            IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0)
+        ]
+        await database.password_resets.create_indexes(password_resets_indexes)
+        
         logger.info("Database indexes created successfully")
         
     except Exception as e:
         logger.error(f"Failed to create indexes: {e}")
         raise
 
+async def run_once(name: str, migration):
+    """Run a data migration once per database; later boots only read its marker"""
+    # Claiming the marker first keeps concurrently starting processes from
+    # running the same migration
+    try:
+        await db.database.migrations.insert_one({"_id": name, "started_at": datetime.utcnow()})
+    except DuplicateKeyError:
+        return
+    
+    try:
+        await migration()
+    except Exception:
+        # Released so the next boot retries
+        await db.database.migrations.delete_one({"_id": name})
+        raise
+    await db.database.migrations.update_one({"_id": name}, {"$set": {"completed_at": datetime.utcnow()}})
+
+async def run_migrations():
+    """Apply pending data migrations; called by the API at startup, not by workers"""
+    await run_once("message_active_visible", backfill_message_visibility)
+
+async def backfill_message_visibility():
+    """Set active_visible on messages written before the field existed"""
+    # Visible means main conversation (no branch) or the active branch
+    result = await db.database.messages.update_many(
+        {"active_visible": {"$exists": False}},
+        [{"$set": {"active_visible": {"$or": [
+            {"$eq": [{"$ifNull": ["$conversation_branch", None]}, None]},
+            {"$eq": ["$conversation_branch.is_active_branch", True]}
+        ]}}}]
+    )
+    if result.modified_count:
+        logger.info(f"Backfilled active_visible on {result.modified_count} messages")
+
 # Database dependency for FastAPI
-async def get_db():
+def get_db():
     """FastAPI dependency to get database"""
-    return await get_database()
\ No newline at end of file
+    return get_database()
\ No newline at end of file
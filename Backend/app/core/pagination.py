@@ -0,0 +1,27 @@
+from typing import Any, Dict, Tuple
+from datetime import datetime
+from bson import ObjectId
+import base64
+
+# Keyset pagination over (sort field, _id). Cursors are opaque to clients:
+# base64url of "<iso timestamp>|<object id>" taken from the last item of a page.
+
+def encode_cursor(value: datetime, oid: ObjectId) -> str:
+    """Cursor pointing just past the given item"""
+    return base64.urlsafe_b64encode(f"{value.isoformat()}|{oid}".encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """Inverse of encode_cursor; raises ValueError on malformed input"""
+    try:
+        value, oid = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(value), ObjectId(oid)
+    except Exception as e:
+        raise ValueError("Invalid pagination cursor") from e
+
+def keyset_filter(field: str, value: datetime, oid: ObjectId, direction: int) -> Dict[str, Any]:
+    """Filter for items after (value, oid) in a (field, _id) sort of the given direction"""
+    op = "$gt" if direction > 0 else "$lt"
+    return {"$or": [
+        {field: {op: value}},
+        {field: value, "_id": {op: oid}}
+    ]}
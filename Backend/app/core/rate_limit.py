@@ -0,0 +1,131 @@
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import asyncio
+import logging
+import time
+
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Local counts are pushed to Redis this often; between syncs each worker
+# enforces limits on its own, so global consistency is deliberately loose.
+RECONCILE_INTERVAL_SECONDS = 5
+
+class RateLimiter:
+    """In-process token bucket per key, reconciled with Redis when configured"""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        # {key: (level, last_refill_ns)}, least recently used first. The level is
+        # tokens scaled by window_ns so refill stays in integer arithmetic.
+        self.state: "OrderedDict[str, Tuple[int, int]]" = OrderedDict()
+        # {key: (requests allowed since last sync, limit, window_s)}
+        self.pending: Dict[str, Tuple[int, int, int]] = {}
+
+    def is_allowed(self, key: str, limit: int, window_s: int) -> bool:
+        """Check if request is allowed based on rate limit"""
+        # Runs without awaiting, so the event loop already serialises access
+        window_ns = window_s * 1_000_000_000
+        capacity = limit * window_ns
+        now = time.monotonic_ns()
+        level, last_refill = self.state.get(key, (capacity, now))
+
+        # Refill at limit tokens per window; one token costs window_ns units
+        level = min(capacity, level + (now - last_refill) * limit)
+        allowed = level >= window_ns
+        if allowed:
+            level -= window_ns
+            count = self.pending[key][0] if key in self.pending else 0
+            self.pending[key] = (count + 1, limit, window_s)
+
+        self.state[key] = (level, now)
+        self.state.move_to_end(key)
+
+        if len(self.state) > self.max_keys:
+            self.state.popitem(last=False)
+        return allowed
+
+    def remaining(self, key: str, window_s: int) -> int:
+        """Whole tokens left in a bucket as of its last check"""
+        entry = self.state.get(key)
+        return entry[0] // (window_s * 1_000_000_000) if entry else 0
+
+    def drain_pending(self) -> Dict[str, Tuple[int, int, int]]:
+        """Take the counts accumulated since the last sync"""
+        pending, self.pending = self.pending, {}
+        return pending
+
+    def apply_global(self, key: str, limit: int, window_s: int, global_count: int):
+        """Cap a local bucket at what the cluster has left for the current window"""
+        entry = self.state.get(key)
+        if entry is None:
+            return
+
+        level, last_refill = entry
+        remaining = max(0, limit - global_count) * window_s * 1_000_000_000
+        if level > remaining:
+            self.state[key] = (remaining, last_refill)
+
+local_rate_limiter = RateLimiter()
+
+def check(key: str, limit: int, window_s: int) -> bool:
+    """Return True if the request identified by key is within limit per window_s seconds"""
+    return local_rate_limiter.is_allowed(key, limit, window_s)
+
+def remaining(key: str, window_s: int) -> int:
+    """Requests left for key right now, for rate limit headers"""
+    return local_rate_limiter.remaining(key, window_s)
+
+async def reconcile():
+    """Push local counts to Redis and pull back the cluster-wide totals"""
+    pending = local_rate_limiter.drain_pending()
+    client = get_redis()
+    if client is None or not pending:
+        return
+
+    # Fixed wall-clock windows so every worker increments the same counter
+    now_s = int(time.time())
+    pipe = client.pipeline(transaction=False)
+    for key, (count, limit, window_s) in pending.items():
+        counter_key = f"{key}:{now_s // window_s}"
+        pipe.incrby(counter_key, count)
+        pipe.expire(counter_key, window_s * 2)
+
+    try:
+        results = await pipe.execute()
+    except Exception as e:
+        logger.error(f"Rate limit reconciliation failed: {e}")
+        return
+
+    for (key, (_, limit, window_s)), global_count in zip(pending.items(), results[::2]):
+        local_rate_limiter.apply_global(key, limit, window_s, global_count)
+
+async def _reconcile_loop():
+    while True:
+        await asyncio.sleep(RECONCILE_INTERVAL_SECONDS)
+        try:
+            await reconcile()
+        except Exception as e:
+            logger.error(f"Rate limit reconciliation failed: {e}")
+
+_reconcile_task: Optional[asyncio.Task] = None
+
+def start_reconciler():
+    """Start periodic Redis reconciliation (no-op without Redis)"""
+    global _reconcile_task
+    if get_redis() is None or _reconcile_task is not None:
+        return
+    _reconcile_task = asyncio.create_task(_reconcile_loop())
+
+async def stop_reconciler():
+    """Stop periodic reconciliation"""
+    global _reconcile_task
+    if _reconcile_task is None:
+        return
+    _reconcile_task.cancel()
+    try:
+        await _reconcile_task
+    except asyncio.CancelledError:
+        pass
+    _reconcile_task = None
@@ -0,0 +1,50 @@
+from typing import Optional
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # redis is optional; in-process fallbacks are used without it
+    aioredis = None
+
+class RedisConnection:
+    client: Optional["aioredis.Redis"] = None
+
+# Global redis instance
+redis_conn = RedisConnection()
+
+async def connect_to_redis():
+    """Create Redis connection pool (optional, enabled by REDIS_URL)"""
+    if not settings.REDIS_URL:
+        logger.info("REDIS_URL not set - rate limits and caches stay per-process")
+        return
+
+    if aioredis is None:
+        logger.warning("REDIS_URL set but the 'redis' package is not installed - rate limits and caches stay per-process")
+        return
+
+    try:
+        redis_conn.client = aioredis.from_url(
+            settings.REDIS_URL,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            decode_responses=False
+        )
+        await redis_conn.client.ping()
+        logger.info("✅ Connected to Redis")
+
+    except Exception as e:
+        logger.error(f"❌ Failed to connect to Redis, rate limits and caches stay per-process: {e}")
+        redis_conn.client = None
+
+async def close_redis_connection():
+    """Close Redis connection pool"""
+    if redis_conn.client is not None:
+        await redis_conn.client.aclose()
+        redis_conn.client = None
+        logger.info("Disconnected from Redis")
+
+def get_redis() -> Optional["aioredis.Redis"]:
+    """Get Redis client, or None when Redis is not configured"""
+    return redis_conn.client
@@ -0,0 +1,99 @@
+from typing import Any, Optional, Tuple
+from cachetools import TTLCache
+from fastapi import Response
+from pydantic import BaseModel
+import functools
+import logging
+import time
+import orjson
+
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Serialized GET responses keyed by (user, path, query string). Lives in Redis
+# when configured so every worker shares it, in-process otherwise. Entries
+# are dropped per user on any chat write; the TTL only bounds staleness
+# for writes made outside this app.
+DEFAULT_TTL_SECONDS = 30
+MAX_TTL_SECONDS = 300
+
+# {key: (expires_at, body)}; entries carry their own expiry since TTLs vary
+_local_cache: TTLCache = TTLCache(maxsize=10_000, ttl=MAX_TTL_SECONDS)
+
+def _resp_key(user_id: str, path: str, query: str) -> str:
+    return f"resp:{user_id}:{path}?{query}"
+
+def _user_responses_key(user_id: str) -> str:
+    return f"respusr:{user_id}"
+
+def _serialize(result: Any) -> bytes:
+    if isinstance(result, BaseModel):
+        result = result.model_dump(by_alias=True)
+    return orjson.dumps(result, default=str)
+
+async def get(key: str) -> Optional[bytes]:
+    """Cached response body, or None on a miss"""
+    client = get_redis()
+    if client is None:
+        cached: Optional[Tuple[float, bytes]] = _local_cache.get(key)
+        if cached is not None and cached[0] > time.time():
+            return cached[1]
+        return None
+
+    try:
+        return await client.get(key)
+    except Exception as e:
+        logger.error(f"Response cache lookup failed: {e}")
+        return None
+
+async def store(key: str, user_id: str, body: bytes, ttl: int):
+    """Cache a response body and index it under its user for invalidation"""
+    client = get_redis()
+    if client is None:
+        _local_cache[key] = (time.time() + ttl, body)
+        return
+
+    try:
+        user_responses = _user_responses_key(user_id)
+        pipe = client.pipeline(transaction=False)
+        pipe.setex(key, ttl, body)
+        pipe.sadd(user_responses, key)
+        pipe.expire(user_responses, MAX_TTL_SECONDS)
+        await pipe.execute()
+    except Exception as e:
+        logger.error(f"Response cache store failed: {e}")
+
+async def invalidate_user(user_id: str):
+    """Drop every cached response belonging to a user"""
+    prefix = _resp_key(user_id, "", "")[:-1]
+    for key in [k for k in list(_local_cache.keys()) if k.startswith(prefix)]:
+        _local_cache.pop(key, None)
+
+    client = get_redis()
+    if client is not None:
+        try:
+            user_responses = _user_responses_key(user_id)
+            keys = await client.smembers(user_responses)
+            await client.delete(user_responses, *keys)
+        except Exception as e:
+            logger.error(f"Response cache invalidation failed: {e}")
+
+def cached_response(ttl: int = DEFAULT_TTL_SECONDS):
+    """Cache a GET endpoint's JSON per user; the endpoint must take `request`, `response` and `current_user`"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            request, response, user = kwargs["request"], kwargs["response"], kwargs["current_user"]
+            user_id = str(user.id)
+            key = _resp_key(user_id, request.url.path, request.url.query)
+
+            body = await get(key)
+            if body is None:
+                body = _serialize(await func(*args, **kwargs))
+                await store(key, user_id, body, ttl)
+            # Headers set by dependencies (rate limits) live on the injected
+            # response, which FastAPI ignores once a Response is returned
+            return Response(content=body, media_type="application/json", headers=dict(response.headers))
+        return wrapper
+    return decorator
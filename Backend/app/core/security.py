@@ -1,13 +1,28 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Any, Union, Optional
+from typing import Any, Union, Optional, Tuple
+import asyncio
+import hashlib
+import os
+import secrets
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status
 from pydantic import ValidationError
 from app.core.config import settings
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing - Argon2id for new hashes, bcrypt kept so existing hashes still verify
+pwd_context = CryptContext(
+    schemes=["argon2", "bcrypt"],
+    deprecated="auto",
+    argon2__type="ID",
+    argon2__time_cost=2,
+    argon2__memory_cost=64 * 1024,
+    argon2__parallelism=1
+)
+
+# Hashing is CPU-bound; run it off the event loop
+HASH_POOL = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="pwd-hash")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify password against hash"""
@@ -17,6 +32,18 @@ def get_password_hash(password: str) -> str:
     """Generate password hash"""
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify password in the hash pool; returns (valid, upgraded_hash_or_None)"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        HASH_POOL, pwd_context.verify_and_update, plain_password, hashed_password
+    )
+
+async def get_password_hash_async(password: str) -> str:
+    """Generate password hash in the hash pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(HASH_POOL, pwd_context.hash, password)
+
 def create_access_token(subject: Union[str, Any], expires_delta: timedelta = None) -> str:
     """Create JWT access token"""
     if expires_delta:
@@ -71,6 +98,14 @@ def verify_token(token: str, token_type: str = "access") -> Optional[str]:
     except (JWTError, ValidationError):
         return None
 
+def generate_reset_token() -> str:
+    """Generate a password reset token"""
+    return secrets.token_urlsafe(32)
+
+def hash_reset_token(token: str) -> bytes:
+    """Fixed-width digest stored in place of the raw reset token"""
+    return hashlib.sha256(token.encode()).digest()
+
 def validate_password_strength(password: str) -> bool:
     """Validate password strength"""
     if len(password) < 8:
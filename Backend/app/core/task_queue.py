@@ -0,0 +1,52 @@
+from typing import Optional
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    from arq import create_pool
+    from arq.connections import ArqRedis, RedisSettings
+except ImportError:  # arq is optional; AI jobs run as in-process background tasks without it
+    create_pool = None
+
+# Channel prefix for chat events published by workers (chat:{chat_id})
+CHAT_EVENTS_CHANNEL_PREFIX = "chat:"
+
+class TaskQueue:
+    pool: Optional["ArqRedis"] = None
+
+# Global task queue instance
+task_queue = TaskQueue()
+
+def redis_settings() -> "RedisSettings":
+    """arq connection settings, shared by the API and the worker"""
+    return RedisSettings.from_dsn(settings.REDIS_URL or "redis://localhost:6379")
+
+async def connect_to_task_queue():
+    """Create arq pool for offloading AI generation (optional, enabled by REDIS_URL)"""
+    if not settings.REDIS_URL:
+        logger.info("REDIS_URL not set - AI generation runs in-process")
+        return
+
+    if create_pool is None:
+        logger.warning("REDIS_URL set but the 'arq' package is not installed - AI generation runs in-process")
+        return
+
+    try:
+        task_queue.pool = await create_pool(redis_settings())
+        logger.info("✅ Connected to task queue")
+    except Exception as e:
+        logger.error(f"❌ Failed to connect to task queue, AI generation runs in-process: {e}")
+        task_queue.pool = None
+
+async def close_task_queue():
+    """Close arq pool"""
+    if task_queue.pool is not None:
+        await task_queue.pool.aclose()
+        task_queue.pool = None
+        logger.info("Disconnected from task queue")
+
+def get_task_queue() -> Optional["ArqRedis"]:
+    """Get arq pool, or None when jobs should run in-process"""
+    return task_queue.pool
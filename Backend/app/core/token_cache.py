@@ -0,0 +1,169 @@
+from typing import Optional, Tuple
+from bson import ObjectId
+from cachetools import TTLCache
+import hashlib
+import logging
+import time
+import orjson
+
+from app.core.redis import get_redis
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+# Two-tier authenticated user cache keyed by blake2b(token), so raw
+# credentials are never held in memory or in Redis.
+#   L1: in-process TTL LRU (per worker)
+#   L2: Redis, shared by every worker
+# Negative entries remember tokens whose user was not found so repeated
+# attempts do not reach Mongo; inactive accounts are not cached negatively.
+L1_TTL_SECONDS = 60
+L2_TTL_SECONDS = 300
+NEGATIVE_TTL_SECONDS = 10
+
+# {key: (user, token_exp)}
+_l1_cache: TTLCache = TTLCache(maxsize=50_000, ttl=L1_TTL_SECONDS)
+_l1_negative: TTLCache = TTLCache(maxsize=10_000, ttl=NEGATIVE_TTL_SECONDS)
+
+def token_key(token: str) -> bytes:
+    """Cache key for a bearer token"""
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+def _tok_key(key: bytes) -> str:
+    return f"tok:{key.hex()}"
+
+def _neg_key(key: bytes) -> str:
+    return f"neg:{key.hex()}"
+
+def _user_tokens_key(user_id: str) -> str:
+    return f"tokusr:{user_id}"
+
+def _encode_user(user: User, token_exp: float) -> bytes:
+    # The password hash never leaves the process
+    data = user.model_dump(exclude={"password_hash"})
+    data["token_exp"] = token_exp
+    return orjson.dumps(data, default=str)
+
+def _decode_user(blob: bytes) -> Tuple[User, float]:
+    data = orjson.loads(blob)
+    token_exp = data.pop("token_exp", 0)
+    data["_id"] = ObjectId(data.pop("id"))
+    data["password_hash"] = ""
+    return User(**data), token_exp
+
+def get_local(key: bytes) -> Optional[User]:
+    """L1 lookup; never returns a user past the token's own expiry"""
+    cached = _l1_cache.get(key)
+    if cached is not None:
+        user, token_exp = cached
+        if token_exp > time.time():
+            return user
+        _l1_cache.pop(key, None)
+    return None
+
+def is_negative_local(key: bytes) -> bool:
+    return key in _l1_negative
+
+def queue_lookup(pipe, key: bytes):
+    """Add the L2 lookup commands to a Redis pipeline"""
+    pipe.get(_tok_key(key))
+    pipe.exists(_neg_key(key))
+
+def apply_lookup(key: bytes, blob: Optional[bytes], negative: int) -> Tuple[Optional[User], bool]:
+    """Interpret queue_lookup results, warming L1 on a hit"""
+    if negative:
+        _l1_negative[key] = True
+        return None, True
+
+    if blob:
+        user, token_exp = _decode_user(blob)
+        if token_exp > time.time():
+            _l1_cache[key] = (user, token_exp)
+            return user, False
+
+    return None, False
+
+async def lookup(key: bytes) -> Tuple[Optional[User], bool]:
+    """L1 then L2 lookup; returns (user, is_negative)"""
+    user = get_local(key)
+    if user is not None:
+        return user, False
+
+    if is_negative_local(key):
+        return None, True
+
+    client = get_redis()
+    if client is None:
+        return None, False
+
+    try:
+        pipe = client.pipeline(transaction=False)
+        queue_lookup(pipe, key)
+        blob, negative = await pipe.execute()
+        return apply_lookup(key, blob, negative)
+    except Exception as e:
+        logger.error(f"Token cache L2 lookup failed: {e}")
+        return None, False
+
+async def store(key: bytes, user: User, token_exp: float):
+    """Populate L1 and L2 for a verified token"""
+    _l1_cache[key] = (user, token_exp)
+
+    client = get_redis()
+    if client is None:
+        return
+
+    ttl = min(L2_TTL_SECONDS, int(token_exp - time.time()))
+    if ttl <= 0:
+        return
+
+    try:
+        user_tokens = _user_tokens_key(str(user.id))
+        pipe = client.pipeline(transaction=False)
+        pipe.setex(_tok_key(key), ttl, _encode_user(user, token_exp))
+        pipe.sadd(user_tokens, key.hex())
+        pipe.expire(user_tokens, L2_TTL_SECONDS)
+        await pipe.execute()
+    except Exception as e:
+        logger.error(f"Token cache L2 store failed: {e}")
+
+async def store_negative(key: bytes):
+    """Remember a token whose user is missing or inactive"""
+    _l1_negative[key] = True
+
+    client = get_redis()
+    if client is None:
+        return
+
+    try:
+        await client.setex(_neg_key(key), NEGATIVE_TTL_SECONDS, b"1")
+    except Exception as e:
+        logger.error(f"Token cache negative store failed: {e}")
+
+async def invalidate_token(token: str):
+    """Evict a token from both cache tiers"""
+    key = token_key(token)
+    _l1_cache.pop(key, None)
+
+    client = get_redis()
+    if client is not None:
+        try:
+            await client.delete(_tok_key(key))
+        except Exception as e:
+            logger.error(f"Token cache L2 invalidation failed: {e}")
+
+async def invalidate_user(user_id: str):
+    """Evict every cached token belonging to a user from both tiers"""
+    for key, (user, _) in list(_l1_cache.items()):
+        if str(user.id) == user_id:
+            _l1_cache.pop(key, None)
+
+    client = get_redis()
+    if client is not None:
+        try:
+            user_tokens = _user_tokens_key(user_id)
+            members = await client.smembers(user_tokens)
+            keys = [_tok_key(bytes.fromhex(m.decode() if isinstance(m, bytes) else m)) for m in members]
+            await client.delete(user_tokens, *keys)
+        except Exception as e:
+            logger.error(f"Token cache L2 user invalidation failed: {e}")
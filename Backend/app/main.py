@@ -1,21 +1,27 @@
 from fastapi import FastAPI, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from fastapi.exception_handlers import http_exception_handler
 import time
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
 from app.core.config import settings
-from app.core.database import connect_to_mongo, close_mongo_connection
+from app.core.logging_config import setup_logging, stop_logging
+from app.core.database import connect_to_mongo, close_mongo_connection, get_database, run_migrations
+from app.core.redis import connect_to_redis, close_redis_connection, get_redis
+from app.core.task_queue import CHAT_EVENTS_CHANNEL_PREFIX, connect_to_task_queue, close_task_queue
+from app.core.rate_limit import start_reconciler, stop_reconciler
 from app.api.v1 import auth, chats, websocket
+from app.services.auth_service import AuthService
+from app.services.chat_service import EnhancedChatService
+from app.services.ai_service import AIService
+from app.websocket.manager import connection_manager
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
+setup_logging(logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Lifespan events
@@ -23,15 +29,39 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting LawBuddy API...")
+    if settings.ASYNC_DEBUG_SLOW_CALLBACK:
+        # Surfaces blocking calls that slipped onto the event loop
+        loop = asyncio.get_running_loop()
+        loop.set_debug(True)
+        loop.slow_callback_duration = settings.ASYNC_DEBUG_SLOW_CALLBACK
     await connect_to_mongo()
+    await run_migrations()
+    app.state.db = get_database()
+    
+    # Services hold no per-request state, so one instance serves every request
+    app.state.auth_service = AuthService(app.state.db)
+    app.state.chat_service = EnhancedChatService(app.state.db)
+    app.state.ai_service = AIService(app.state.db)
+    await connect_to_redis()
+    start_reconciler()
+    await connect_to_task_queue()
+    if get_redis() is not None:
+        # AI workers and other API processes publish chat events; relay them
+        # to this process's sockets
+        connection_manager.start_relay(get_redis(), CHAT_EVENTS_CHANNEL_PREFIX)
     logger.info("LawBuddy API started successfully")
     
     yield
     
     # Shutdown
     logger.info("Shutting down LawBuddy API...")
+    await connection_manager.stop_relay()
+    await close_task_queue()
+    await stop_reconciler()
+    await close_redis_connection()
     await close_mongo_connection()
     logger.info("LawBuddy API shutdown complete")
+    stop_logging()
 
 # Create FastAPI app
 app = FastAPI(
@@ -61,6 +91,7 @@ app = FastAPI(
     **Disclaimer**: LawBuddy provides general legal information. For specific legal advice, consult a qualified lawyer.
     """,
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     docs_url="/docs" if settings.DEBUG else None,
     redoc_url="/redoc" if settings.DEBUG else None
 )
@@ -122,7 +153,8 @@ async def custom_http_exception_handler(request: Request, exc: HTTPException):
             "path": str(request.url),
             "method": request.method,
             "timestamp": time.time()
-        }
+        },
+        headers=getattr(exc, "headers", None)
     )
 
 @app.exception_handler(Exception)
@@ -159,19 +191,19 @@ async def root():
 
 # Health check endpoint
 @app.get("/health", tags=["Health"])
-async def health_check():
+async def health_check(request: Request):
     """
     Health check endpoint for monitoring and load balancers
     """
-    from app.api.deps import check_database_health, check_ai_service_health, get_db, get_ai_service
+    from app.api.deps import check_database_health, check_ai_service_health
     
     try:
         # Check database connection
-        db = await get_db()
+        db = get_database()
         db_healthy = await check_database_health(db)
         
         # Check AI service
-        ai_service = await get_ai_service(db)
+        ai_service = request.app.state.ai_service
         ai_healthy = await check_ai_service_health(ai_service)
         
         # Overall health status
@@ -344,9 +376,7 @@ if settings.DEBUG:
         Reset database (DEBUG ONLY - removes all data)
         """
         try:
-            from app.core.database import get_database
-            
-            db = await get_database()
+            db = get_database()
             
             # Drop all collections
             collections = await db.list_collection_names()
@@ -372,6 +402,7 @@ if settings.DEBUG:
 
 # Run the application
 if __name__ == "__main__":
+    import sys
     import uvicorn
     
     uvicorn.run(
@@ -379,5 +410,12 @@ if __name__ == "__main__":
         host=settings.HOST,
         port=settings.PORT,
         reload=settings.DEBUG,
-        log_level="info"
+        log_level="info",
+        # uvloop and httptools come with uvicorn[standard]; uvloop has no
+        # Windows build, so the stock loop is used there. There is no io_uring
+        # option: the server owns the sockets and uvicorn has no hook for
+        # another transport, so broadcast sends are batched by the
+        # per-connection writers instead
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools"
     )
\ No newline at end of file
@@ -57,6 +57,7 @@ class ChatSession(BaseMongoModel):
     last_message_at: Optional[datetime] = None
     conversation_summary: Optional[str] = None
     context_window_size: int = 10  # Number of messages to keep in context
+    branch_count: Optional[int] = None  # Regeneration branches; None for chats that predate tracking
 
 class TokenUsage(BaseModel):
     input_tokens: int = 0
@@ -116,6 +117,7 @@ class Message(BaseMongoModel):
     
     # Conversation branching
     conversation_branch: Optional[ConversationBranch] = None
+    active_visible: bool = True  # Main conversation or active branch
     parent_message_id: Optional[PyObjectId] = None
     child_message_ids: List[PyObjectId] = []
     
@@ -1,6 +1,7 @@
 # schemas/auth.py
-from pydantic import BaseModel, EmailStr, field_validator, ConfigDict
+from pydantic import BaseModel, EmailStr, SecretStr, field_validator, ConfigDict
 from typing import Optional
+from app.core.security import validate_password_strength
 
 class UserRegister(BaseModel):
     model_config = ConfigDict(str_strip_whitespace=True)
@@ -35,3 +36,16 @@ class PasswordReset(BaseModel):
 class PasswordResetConfirm(BaseModel):
     token: str
     new_password: str
+
+
+class PasswordChange(BaseModel):
+    current_password: SecretStr
+    new_password: SecretStr
+    
+    @field_validator('new_password')
+    @classmethod
+    def validate_new_password(cls, v):
+        # Reject weak passwords before the service spends a hash verification on them
+        if not validate_password_strength(v.get_secret_value()):
+            raise ValueError('New password must be at least 8 characters long and contain uppercase, lowercase, number, and special character')
+        return v
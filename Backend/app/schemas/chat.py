@@ -43,12 +43,30 @@ class ChatSessionResponse(BaseModel):
     status: ChatStatus
     metadata: EnhancedChatMetadata
     tags: List[str]
-    created_at: str
-    updated_at: str
-    last_message_at: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    last_message_at: Optional[datetime] = None
     conversation_summary: Optional[str] = None
     context_window_size: int = 10
 
+    @classmethod
+    def from_chat(cls, chat) -> "ChatSessionResponse":
+        """Build response from a trusted ChatSession model without re-validating"""
+        return cls.model_construct(
+            id=str(chat.id),
+            title=chat.title,
+            preview=chat.preview,
+            status=chat.status,
+            # Same fields as ChatMetadata, so share its values instead of dumping a copy
+            metadata=EnhancedChatMetadata.model_construct(**chat.metadata.__dict__),
+            tags=chat.tags,
+            created_at=chat.created_at,
+            updated_at=chat.updated_at,
+            last_message_at=chat.last_message_at,
+            conversation_summary=chat.conversation_summary,
+            context_window_size=chat.context_window_size
+        )
+
 class MessageCreate(BaseModel):
     model_config = ConfigDict(str_strip_whitespace=True)
     
@@ -82,6 +100,17 @@ class AIMetadataResponse(BaseModel):
     safety_ratings: Optional[Dict[str, Any]] = None
     finish_reason: Optional[str] = None
 
+    @classmethod
+    def from_data(cls, data: Optional[Dict[str, Any]]) -> Optional["AIMetadataResponse"]:
+        """Build response from stored ai_metadata without re-validating"""
+        if not data:
+            return None
+        token_usage = data.get("token_usage")
+        return cls.model_construct(**{
+            **data,
+            "token_usage": TokenUsageResponse.model_construct(**token_usage) if token_usage else None
+        })
+
 class MessageFormattingResponse(BaseModel):
     has_formatting: bool = False
     sections: List[str] = []
@@ -91,6 +120,11 @@ class MessageFormattingResponse(BaseModel):
     has_tables: bool = False
     has_lists: bool = False
 
+    @classmethod
+    def from_data(cls, data: Optional[Dict[str, Any]]) -> Optional["MessageFormattingResponse"]:
+        """Build response from stored formatting without re-validating"""
+        return cls.model_construct(**data) if data else None
+
 class UserInteractionResponse(BaseModel):
     helpful_rating: Optional[int] = None
     feedback: Optional[str] = None
@@ -119,8 +153,8 @@ class MessageResponse(BaseModel):
     ai_metadata: Optional[AIMetadataResponse] = None
     formatting: Optional[MessageFormattingResponse] = None
     user_interaction: Optional[UserInteractionResponse] = None
-    timestamp: str
-    created_at: str
+    timestamp: datetime
+    created_at: datetime
     
     # Enhanced fields
     conversation_branch: Optional[ConversationBranchResponse] = None
@@ -130,6 +164,37 @@ class MessageResponse(BaseModel):
     stream_id: Optional[str] = None
     metadata: Optional[Dict[str, Any]] = None  # Additional metadata
 
+    @classmethod
+    def from_message(cls, msg) -> "MessageResponse":
+        """Build response from a trusted Message model without re-validating"""
+        return cls.model_construct(
+            id=str(msg.id),
+            chat_session_id=str(msg.chat_session_id),
+            role=msg.role,
+            content=msg.content,
+            message_type=msg.message_type,
+            ai_metadata=AIMetadataResponse.from_data(msg.ai_metadata.model_dump() if msg.ai_metadata else None),
+            formatting=MessageFormattingResponse.from_data(msg.formatting.model_dump() if msg.formatting else None),
+            timestamp=msg.timestamp,
+            created_at=msg.created_at
+        )
+
+    @classmethod
+    def from_doc(cls, doc: Dict[str, Any], metadata: Optional[Dict[str, Any]] = None) -> "MessageResponse":
+        """Build response from a projected message document without re-validating"""
+        return cls.model_construct(
+            id=str(doc["_id"]),
+            chat_session_id=str(doc["chat_session_id"]),
+            role=MessageRole(doc["role"]),
+            content=doc["content"],
+            message_type=MessageType(doc["message_type"]),
+            ai_metadata=AIMetadataResponse.from_data(doc.get("ai_metadata")),
+            formatting=MessageFormattingResponse.from_data(doc.get("formatting")),
+            timestamp=doc["timestamp"],
+            created_at=doc["created_at"],
+            metadata=metadata
+        )
+
 class MessageInteractionUpdate(BaseModel):
     helpful_rating: Optional[int] = None
     feedback: Optional[str] = None
@@ -153,6 +218,7 @@ class ChatHistoryResponse(BaseModel):
     page: int
     size: int
     has_next: bool
+    next_cursor: Optional[str] = None
 
 class MessageHistoryResponse(BaseModel):
     messages: List[MessageResponse]
@@ -160,16 +226,42 @@ class MessageHistoryResponse(BaseModel):
     page: int
     size: int
     has_next: bool
+    next_cursor: Optional[str] = None
+
+class MessageStatistics(BaseModel):
+    total_messages: int = 0
+    user_messages: int = 0
+    ai_messages: int = 0
+    failed_messages: int = 0
+    regenerated_messages: int = 0
+    success_rate: float = 100.0
+
+class AIPerformanceStatistics(BaseModel):
+    avg_confidence: float = 0.0
+    total_tokens: int = 0
+    total_cost: float = 0.0
+    avg_cost_per_message: float = 0.0
+
+class BranchingStatistics(BaseModel):
+    total_branches: int = 0
+    active_branches: int = 0
+    branch_points: List[Optional[str]] = []
+
+class UserInteractionStatistics(BaseModel):
+    avg_rating: float = 0.0
+    bookmarked_messages: int = 0
+    shared_messages: int = 0
 
 class ChatAnalyticsResponse(BaseModel):
     chat_id: str
-    message_statistics: Dict[str, Any]
-    ai_performance: Dict[str, Any]
-    branching_statistics: Dict[str, Any]
-    user_interaction: Dict[str, Any]
+    chat_metadata: Dict[str, Any]
     conversation_health: Dict[str, Any]
+    message_statistics: MessageStatistics
+    ai_performance: AIPerformanceStatistics
+    branching_statistics: BranchingStatistics
+    user_interaction: UserInteractionStatistics
     legal_categories: List[str]
-    generated_at: str
+    generated_at: datetime
 
 class ConversationExportRequest(BaseModel):
     format: str = "json"
@@ -7,6 +7,7 @@ class PaginationParams(BaseModel):
     
     page: int = 1
     size: int = 20
+    after: Optional[str] = None  # Keyset cursor; takes precedence over page
 
 class SuccessResponse(BaseModel):
     success: bool = True
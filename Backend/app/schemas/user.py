@@ -15,6 +15,20 @@ class UserResponse(BaseModel):
     is_active: bool
     created_at: str
 
+    @classmethod
+    def from_user(cls, user) -> "UserResponse":
+        """Build response from a trusted User model without re-validating"""
+        return cls.model_construct(
+            id=str(user.id),
+            email=user.email,
+            profile=user.profile,
+            preferences=user.preferences,
+            subscription=user.subscription.model_dump(),
+            usage_stats=user.usage_stats.model_dump(),
+            is_active=user.is_active,
+            created_at=user.created_at.isoformat()
+        )
+
 class UserUpdate(BaseModel):
     full_name: Optional[str] = None
     location: Optional[str] = None
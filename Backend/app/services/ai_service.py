@@ -410,7 +410,7 @@ class AIService:
                 cache_key = self._get_cache_key(user_message, chat_session_id)
                 cached_response = self._get_cached_response(cache_key)
                 if cached_response:
-                    logger.info(f"Returning cached response for session {chat_session_id}")
+                    logger.debug("Returning cached response for session %s", chat_session_id)
                     return cached_response
             
             # Build prompt with conversation context
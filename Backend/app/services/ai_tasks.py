@@ -0,0 +1,145 @@
+from typing import Awaitable, Callable, Union
+import asyncio
+import orjson
+
+from app.models.chat import MessageRole, ResponseFormat
+from app.models.user import User
+from app.schemas.chat import MessageCreate
+from app.services.chat_service import EnhancedChatService
+from app.services.ai_service import AIService
+
+# AI generation jobs. They run either in-process (FastAPI background tasks)
+# or in the arq worker (app.worker); `publish` delivers chat events to
+# WebSocket clients in whichever way suits the process running the job.
+Publisher = Callable[[str, Union[bytes, str]], Awaitable[None]]
+
+async def generate_ai_response(
+    chat_id: str, 
+    user_message: str, 
+    user: User, 
+    chat_service: EnhancedChatService,
+    ai_service: AIService,
+    response_format: ResponseFormat,
+    regenerate: bool,
+    publish: Publisher
+):
+    """Generate an AI reply to a user message, publishing progress events for the chat"""
+    # The model call only needs the prompt and in-memory context, so it starts
+    # right away and overlaps with the pending-message write and notification
+    generation = asyncio.create_task(
+        ai_service.generate_response(
+            user_message,
+            chat_id,
+            user,
+            response_format=response_format,
+            regenerate=regenerate
+        )
+    )
+    
+    try:
+        # Create pending AI message
+        # Placeholders are empty by design, which MessageCreate validation rejects
+        ai_message_create = MessageCreate.model_construct(
+            content="",
+            role=MessageRole.ASSISTANT
+        )
+        
+        ai_message = await chat_service.create_pending_message(
+            chat_id, user, ai_message_create
+        )
+        
+        stream_id = ai_message.stream_id
+        
+        # Notify WebSocket clients that AI response started
+        await publish(
+            chat_id,
+            orjson.dumps({
+                "type": "ai_response_started",
+                "message_id": str(ai_message.id),
+                "metadata": {
+                    "chat_id": chat_id,
+                    "stream_id": stream_id
+                }
+            })
+        )
+        
+        ai_response = await generation
+        
+        if ai_response["success"]:
+            # Complete the message
+            await chat_service.complete_streaming_message(
+                stream_id,
+                ai_response["content"],
+                ai_response["metadata"],
+                ai_response.get("formatting")
+            )
+            
+            # Notify WebSocket clients of completion
+            await publish(
+                chat_id,
+                orjson.dumps({
+                    "type": "ai_response_complete",
+                    "content": ai_response["content"],
+                    "message_id": str(ai_message.id),
+                    "metadata": {
+                        "chat_id": chat_id,
+                        "ai_metadata": ai_response["metadata"].model_dump() if ai_response["metadata"] else None
+                    }
+                })
+            )
+        else:
+            # Mark message as failed
+            await chat_service.fail_message(stream_id, ai_response.get("content", "AI generation failed"))
+            
+            # Notify WebSocket clients of error
+            await publish(
+                chat_id,
+                orjson.dumps({
+                    "type": "ai_response_error",
+                    "error": ai_response.get("content", "AI generation failed"),
+                    "message_id": str(ai_message.id),
+                    "metadata": {"chat_id": chat_id}
+                })
+            )
+            
+    except Exception as e:
+        # Handle any errors in background task
+        generation.cancel()
+        if 'stream_id' in locals():
+            await chat_service.fail_message(stream_id, f"Background generation error: {str(e)}")
+
+async def regenerate_ai_response(
+    chat_id: str,
+    user_message: str,
+    user: User,
+    chat_service: EnhancedChatService,
+    ai_service: AIService,
+    stream_id: str,
+    response_format: ResponseFormat
+):
+    """Regenerate an AI reply into an existing pending message"""
+    try:
+        # Start streaming for regeneration
+        await chat_service.start_message_streaming(stream_id)
+        
+        # Generate new AI response (force regeneration)
+        ai_response = await ai_service.generate_response(
+            user_message,
+            chat_id,
+            user,
+            response_format=response_format,
+            regenerate=True  # Force regeneration
+        )
+        
+        if ai_response["success"]:
+            await chat_service.complete_streaming_message(
+                stream_id,
+                ai_response["content"],
+                ai_response["metadata"],
+                ai_response.get("formatting")
+            )
+        else:
+            await chat_service.fail_message(stream_id, ai_response.get("content", "Regeneration failed"))
+            
+    except Exception as e:
+        await chat_service.fail_message(stream_id, f"Regeneration error: {str(e)}")
@@ -1,16 +1,19 @@
-from typing import Optional
+from typing import Optional, Tuple
 from datetime import datetime, timedelta
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from fastapi import HTTPException, status
 from bson import ObjectId
+import hmac
 
 from app.core.security import (
-    verify_password, 
-    get_password_hash, 
+    verify_password_async,
+    get_password_hash_async,
     create_access_token, 
     create_refresh_token,
     verify_token,
-    validate_password_strength
+    validate_password_strength,
+    generate_reset_token,
+    hash_reset_token
 )
 from app.core.config import settings
 from app.models.user import User, UserProfile, UsageStats
@@ -42,7 +45,7 @@ class AuthService:
         # Create user document
         user_dict = {
             "email": user_data.email.lower(),
-            "password_hash": get_password_hash(user_data.password),
+            "password_hash": await get_password_hash_async(user_data.password),
             "profile": {
                 "full_name": user_data.full_name,
                 "location": None,
@@ -82,13 +85,18 @@ class AuthService:
         if not user_doc:
             return None
             
-        if not verify_password(password, user_doc["password_hash"]):
+        valid, upgraded_hash = await verify_password_async(password, user_doc["password_hash"])
+        if not valid:
             return None
             
-        # Update last active
+        # Update last active (and transparently migrate legacy bcrypt hashes)
+        update = {"usage_stats.last_active": datetime.utcnow(), "updated_at": datetime.utcnow()}
+        if upgraded_hash:
+            update["password_hash"] = upgraded_hash
+            user_doc["password_hash"] = upgraded_hash
         await self.users_collection.update_one(
             {"_id": user_doc["_id"]},
-            {"$set": {"usage_stats.last_active": datetime.utcnow(), "updated_at": datetime.utcnow()}}
+            {"$set": update}
         )
         
         return User(**user_doc)
@@ -159,6 +167,10 @@ class AuthService:
                 detail="Invalid access token"
             )
         
+        return await self.get_user_by_id(user_id)
+
+    async def get_user_by_id(self, user_id: str) -> User:
+        """Load an active user by id (subject of an already verified token)"""
         user_doc = await self.users_collection.find_one({"_id": ObjectId(user_id)})
         
         if not user_doc:
@@ -199,6 +211,60 @@ class AuthService:
             }
         )
 
+    async def create_password_reset(self, email: str) -> Optional[str]:
+        """Create a password reset token for an active user; only its digest is stored"""
+        user_doc = await self.users_collection.find_one(
+            {"email": email.lower()}, {"_id": 1, "is_active": 1}
+        )
+        if not user_doc or not user_doc.get("is_active", False):
+            return None
+        
+        token = generate_reset_token()
+        now = datetime.utcnow()
+        await self.db.password_resets.insert_one({
+            "token_hash": hash_reset_token(token),
+            "user_id": user_doc["_id"],
+            "expires_at": now + timedelta(minutes=settings.PASSWORD_RESET_EXPIRE_MINUTES),
+            "created_at": now
+        })
+        
+        return token
+
+    async def reset_password(self, token: str, new_password: str) -> Tuple[str, bytes]:
+        """Reset password with a reset token; returns (user_id, token digest)"""
+        
+        if not validate_password_strength(new_password):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="New password must be at least 8 characters long and contain uppercase, lowercase, number, and special character"
+            )
+        
+        # Look up by digest (indexed, fixed width) and consume the token atomically
+        digest = hash_reset_token(token)
+        reset_doc = await self.db.password_resets.find_one_and_delete({
+            "token_hash": digest,
+            "expires_at": {"$gt": datetime.utcnow()}
+        })
+        
+        if not reset_doc or not hmac.compare_digest(bytes(reset_doc["token_hash"]), digest):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid or expired reset token"
+            )
+        
+        new_password_hash = await get_password_hash_async(new_password)
+        await self.users_collection.update_one(
+            {"_id": reset_doc["user_id"]},
+            {
+                "$set": {
+                    "password_hash": new_password_hash,
+                    "updated_at": datetime.utcnow()
+                }
+            }
+        )
+        
+        return str(reset_doc["user_id"]), digest
+
     async def change_password(self, user_id: str, current_password: str, new_password: str):
         """Change user password"""
         
@@ -218,14 +284,15 @@ class AuthService:
             )
         
         # Verify current password
-        if not verify_password(current_password, user_doc["password_hash"]):
+        valid, _ = await verify_password_async(current_password, user_doc["password_hash"])
+        if not valid:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Current password is incorrect"
             )
         
         # Update password
-        new_password_hash = get_password_hash(new_password)
+        new_password_hash = await get_password_hash_async(new_password)
         await self.users_collection.update_one(
             {"_id": ObjectId(user_id)},
             {
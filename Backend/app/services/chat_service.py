@@ -1,9 +1,11 @@
 from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, timedelta
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
 from fastapi import HTTPException, status
 from bson import ObjectId
 import asyncio
+import time
 import uuid
 import logging
 
@@ -13,6 +15,8 @@ from app.models.chat import (
     ResponseFormat, TokenUsage
 )
 from app.models.user import User
+from app.core.pagination import keyset_filter
+from app.core import response_cache
 from app.schemas.chat import (
     ChatSessionCreate, ChatSessionUpdate, MessageCreate,
     ChatSessionResponse, MessageResponse, ChatHistoryResponse, MessageHistoryResponse
@@ -20,6 +24,21 @@ from app.schemas.chat import (
 
 logger = logging.getLogger(__name__)
 
+# Streamed chunks are buffered per stream and persisted as partial_content at
+# most this often, rather than rewriting the growing text on every chunk
+PARTIAL_CONTENT_FLUSH_SECONDS = 1.0
+
+# Fields MessageResponse.from_doc renders for search hits
+SEARCH_RESULT_PROJECTION = {
+    "chat_session_id": 1,
+    "role": 1,
+    "content": 1,
+    "message_type": 1,
+    "ai_metadata": 1,
+    "timestamp": 1,
+    "created_at": 1
+}
+
 class EnhancedChatService:
     def __init__(self, database: AsyncIOMotorDatabase):
         self.db = database
@@ -54,6 +73,7 @@ class EnhancedChatService:
             "last_message_at": None,
             "conversation_summary": None,
             "context_window_size": 10,
+            "branch_count": 0,
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow()
         }
@@ -79,6 +99,7 @@ class EnhancedChatService:
             }
         )
         
+        await response_cache.invalidate_user(str(user.id))
         return ChatSession(**chat_dict)
 
     async def create_pending_message(
@@ -97,14 +118,66 @@ class EnhancedChatService:
         if not stream_id:
             stream_id = str(uuid.uuid4())
         
-        # Create message document with PENDING status
-        message_dict = {
+        message_dict = self._build_message_doc(chat, user, message_data, stream_id)
+        
+        # Insert message
+        result = await self.messages_collection.insert_one(message_dict)
+        message_dict["_id"] = result.inserted_id
+        
+        # Track pending message
+        if message_data.role == MessageRole.ASSISTANT:
+            self._track_pending(stream_id, result.inserted_id, chat_id, user)
+        
+        # Update chat session metadata for user messages
+        if message_data.role == MessageRole.USER:
+            await self._record_user_message(chat_id, user, message_data.content)
+        
+        await response_cache.invalidate_user(str(user.id))
+        return Message(**message_dict)
+
+    async def create_message_pair(
+        self,
+        chat_id: str,
+        user: User,
+        message_data: MessageCreate
+    ) -> Tuple[Message, Message]:
+        """Insert a user message and its pending AI reply in one round-trip"""
+        
+        chat = await self.get_chat_session(chat_id, user)
+        
+        ai_stream_id = str(uuid.uuid4())
+        user_dict = self._build_message_doc(chat, user, message_data, str(uuid.uuid4()))
+        ai_dict = self._build_message_doc(
+            chat, user, MessageCreate.model_construct(content="", role=MessageRole.ASSISTANT), ai_stream_id
+        )
+        
+        # Ordered insert: both documents or an error, never just the reply
+        result = await self.messages_collection.insert_many([user_dict, ai_dict])
+        user_dict["_id"], ai_dict["_id"] = result.inserted_ids
+        
+        self._track_pending(ai_stream_id, ai_dict["_id"], chat_id, user)
+        await self._record_user_message(chat_id, user, message_data.content)
+        
+        await response_cache.invalidate_user(str(user.id))
+        return Message(**user_dict), Message(**ai_dict)
+
+    def _build_message_doc(
+        self,
+        chat: ChatSession,
+        user: User,
+        message_data: MessageCreate,
+        stream_id: str
+    ) -> Dict[str, Any]:
+        """New message document; user messages are complete, AI messages start PENDING"""
+        is_user = message_data.role == MessageRole.USER
+        now = datetime.utcnow()
+        return {
             "chat_session_id": chat.id,
             "user_id": user.id,
             "role": message_data.role,
-            "content": "",  # Empty initially for pending messages
+            "content": message_data.content if is_user else "",  # Empty initially for pending messages
             "message_type": message_data.message_type,
-            "status": MessageStatus.PENDING,
+            "status": MessageStatus.COMPLETE if is_user else MessageStatus.PENDING,
             "ai_metadata": None,
             "formatting": None,
             "user_interaction": {
@@ -116,8 +189,9 @@ class EnhancedChatService:
                 "regeneration_count": 0,
                 "edit_count": 0
             },
-            "timestamp": datetime.utcnow(),
+            "timestamp": now,
             "conversation_branch": None,
+            "active_visible": True,
             "parent_message_id": None,
             "child_message_ids": [],
             "version": 1,
@@ -126,43 +200,31 @@ class EnhancedChatService:
             "stream_id": stream_id,
             "is_streaming": False,
             "partial_content": "",
-            "final_content": message_data.content if message_data.role == MessageRole.USER else "",
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
+            "final_content": message_data.content if is_user else "",
+            "created_at": now,
+            "updated_at": now
         }
-        
-        # For user messages, set content immediately and mark as complete
-        if message_data.role == MessageRole.USER:
-            message_dict["content"] = message_data.content
-            message_dict["status"] = MessageStatus.COMPLETE
-            message_dict["final_content"] = message_data.content
-        
-        # Insert message
-        result = await self.messages_collection.insert_one(message_dict)
-        message_dict["_id"] = result.inserted_id
-        
-        # Track pending message
-        if message_data.role == MessageRole.ASSISTANT:
-            self.pending_messages[stream_id] = {
-                "message_id": str(result.inserted_id),
-                "chat_id": chat_id,
-                "created_at": datetime.utcnow()
-            }
-        
-        # Update chat session metadata for user messages
-        if message_data.role == MessageRole.USER:
-            await self._update_chat_metadata(chat_id, message_data.content)
-            
-            # Update user stats
-            await self.users_collection.update_one(
+
+    def _track_pending(self, stream_id: str, message_id: ObjectId, chat_id: str, user: User):
+        self.pending_messages[stream_id] = {
+            "message_id": str(message_id),
+            "chat_id": chat_id,
+            "user_id": str(user.id),
+            "created_at": datetime.utcnow()
+        }
+
+    async def _record_user_message(self, chat_id: str, user: User, content: str):
+        """Update chat metadata and user stats for a new user message"""
+        await asyncio.gather(
+            self._update_chat_metadata(chat_id, content),
+            self.users_collection.update_one(
                 {"_id": user.id},
                 {
                     "$inc": {"usage_stats.total_messages": 1},
                     "$set": {"updated_at": datetime.utcnow()}
                 }
             )
-        
-        return Message(**message_dict)
+        )
 
     async def start_message_streaming(self, stream_id: str) -> bool:
         """Mark message as streaming"""
@@ -197,28 +259,28 @@ class EnhancedChatService:
     async def update_streaming_message(self, stream_id: str, content_chunk: str) -> bool:
         """Update streaming message with new content chunk"""
         try:
-            if stream_id not in self.streaming_messages:
+            message_info = self.streaming_messages.get(stream_id)
+            if message_info is None:
                 return False
             
-            message_id = self.streaming_messages[stream_id]["message_id"]
+            # Chunks accumulate in a list: appending is O(1) and the text is
+            # joined once per flush instead of copied on every chunk
+            chunks = message_info.setdefault("chunks", [])
+            chunks.append(content_chunk)
             
-            # Get current message to append content
-            message_doc = await self.messages_collection.find_one({"_id": ObjectId(message_id)})
-            if not message_doc:
-                return False
-            
-            new_partial_content = message_doc.get("partial_content", "") + content_chunk
+            now = time.monotonic()
+            if now - message_info.get("flushed_at", 0.0) < PARTIAL_CONTENT_FLUSH_SECONDS:
+                return True
+            message_info["flushed_at"] = now
             
-            # Update message with new chunk
+            partial_content = "".join(chunks)
             result = await self.messages_collection.update_one(
-                {"_id": ObjectId(message_id)},
-                {
-                    "$set": {
-                        "partial_content": new_partial_content,
-                        "content": new_partial_content,  # Update display content
-                        "updated_at": datetime.utcnow()
-                    }
-                }
+                {"_id": ObjectId(message_info["message_id"])},
+                {"$set": {
+                    "partial_content": partial_content,
+                    "content": partial_content,  # Update display content
+                    "updated_at": datetime.utcnow()
+                }}
             )
             
             return result.modified_count > 0
@@ -253,10 +315,10 @@ class EnhancedChatService:
             }
             
             if ai_metadata:
-                update_data["ai_metadata"] = ai_metadata.dict()
+                update_data["ai_metadata"] = ai_metadata.model_dump()
             
             if formatting:
-                update_data["formatting"] = formatting.dict()
+                update_data["formatting"] = formatting.model_dump()
             
             # Update message
             result = await self.messages_collection.update_one(
@@ -267,6 +329,7 @@ class EnhancedChatService:
             if result.modified_count > 0:
                 # Update chat metadata
                 await self._update_chat_metadata_with_ai_response(chat_id, final_content, ai_metadata)
+                await response_cache.invalidate_user(message_info["user_id"])
                 return True
             
         except Exception as e:
@@ -300,6 +363,7 @@ class EnhancedChatService:
             self.pending_messages.pop(stream_id, None)
             self.streaming_messages.pop(stream_id, None)
             
+            await response_cache.invalidate_user(message_tracking["user_id"])
             return result.modified_count > 0
             
         except Exception as e:
@@ -354,6 +418,7 @@ class EnhancedChatService:
                 "branch_reason": "user_regeneration",
                 "is_active_branch": True
             },
+            "active_visible": True,
             "parent_message_id": original_message.id,
             "child_message_ids": [],
             "version": original_message.version + 1,
@@ -391,6 +456,13 @@ class EnhancedChatService:
             {"$inc": {"user_interaction.regeneration_count": 1}}
         )
         
+        # Every regeneration opens a new branch
+        await self.chat_sessions_collection.update_one(
+            {"_id": chat.id},
+            {"$inc": {"branch_count": 1}}
+        )
+        
+        await response_cache.invalidate_user(str(user.id))
         return Message(**regenerated_dict)
 
     async def create_conversation_branch(
@@ -426,11 +498,13 @@ class EnhancedChatService:
             {
                 "$set": {
                     "conversation_branch.is_active_branch": False,
+                    "active_visible": False,
                     "updated_at": datetime.utcnow()
                 }
             }
         )
         
+        await response_cache.invalidate_user(str(user.id))
         return branch_id
 
     async def switch_conversation_branch(self, chat_id: str, branch_id: str, user: User) -> bool:
@@ -439,12 +513,16 @@ class EnhancedChatService:
         # Verify user owns the chat
         await self.get_chat_session(chat_id, user)
         
-        # Deactivate all branches
+        # Deactivate all branches (main conversation messages stay visible)
         await self.messages_collection.update_many(
-            {"chat_session_id": ObjectId(chat_id)},
+            {
+                "chat_session_id": ObjectId(chat_id),
+                "conversation_branch": {"$ne": None}
+            },
             {
                 "$set": {
                     "conversation_branch.is_active_branch": False,
+                    "active_visible": False,
                     "updated_at": datetime.utcnow()
                 }
             }
@@ -459,11 +537,13 @@ class EnhancedChatService:
             {
                 "$set": {
                     "conversation_branch.is_active_branch": True,
+                    "active_visible": True,
                     "updated_at": datetime.utcnow()
                 }
             }
         )
         
+        await response_cache.invalidate_user(str(user.id))
         return result.modified_count > 0
 
     async def get_conversation_branches(self, chat_id: str, user: User) -> List[Dict[str, Any]]:
@@ -522,16 +602,11 @@ class EnhancedChatService:
         message_id: str,
         user: User,
         interaction_data: Dict[str, Any]
-    ) -> bool:
-        """Update user interaction data for a message"""
-        
-        # Verify message exists and user owns the chat
-        message_doc = await self.messages_collection.find_one({"_id": ObjectId(message_id)})
-        if not message_doc:
-            return False
+    ) -> Optional[Dict[str, Any]]:
+        """Update user interaction data for a message, returning the updated interaction state"""
         
-        message = Message(**message_doc)
-        await self.get_chat_session(str(message.chat_session_id), user)
+        if not ObjectId.is_valid(message_id):
+            return None
         
         # Build update query
         update_data = {}
@@ -540,16 +615,24 @@ class EnhancedChatService:
                 update_data[f"user_interaction.{key}"] = value
         
         if not update_data:
-            return False
+            return None
         
         update_data["updated_at"] = datetime.utcnow()
         
-        result = await self.messages_collection.update_one(
-            {"_id": ObjectId(message_id)},
-            {"$set": update_data}
+        # Messages carry their chat owner's user_id, so ownership is part of the
+        # filter and the update and read-back are one round-trip
+        message_doc = await self.messages_collection.find_one_and_update(
+            {"_id": ObjectId(message_id), "user_id": user.id},
+            {"$set": update_data},
+            projection={"user_interaction": 1},
+            return_document=ReturnDocument.AFTER
         )
         
-        return result.modified_count > 0
+        if message_doc is None:
+            return None
+        
+        await response_cache.invalidate_user(str(user.id))
+        return message_doc["user_interaction"]
 
     async def _update_chat_metadata_with_ai_response(
         self, 
@@ -618,15 +701,55 @@ class EnhancedChatService:
         # Get messages from active branch or main conversation
         cursor = self.messages_collection.find({
             "chat_session_id": ObjectId(chat_id),
-            "$or": [
-                {"conversation_branch.is_active_branch": True},
-                {"conversation_branch": None}  # Main conversation
-            ]
+            "active_visible": True
         }).sort("timestamp", 1)
         
         message_docs = await cursor.to_list(length=None)
         return [Message(**doc) for doc in message_docs]
 
+    async def get_active_messages_page(
+        self,
+        chat_id: str,
+        user: User,
+        skip: int,
+        limit: int,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """One page of active branch message documents, and the total count"""
+        if not ObjectId.is_valid(chat_id):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid chat session ID"
+            )
+        
+        # Scoped by user_id, so the page can be read alongside the ownership check
+        query = {
+            "chat_session_id": ObjectId(chat_id),
+            "user_id": user.id,
+            "active_visible": True
+        }
+        cursor = self.messages_collection.find(query, projection).sort([("timestamp", 1), ("_id", 1)])
+        
+        _, message_docs, total = await asyncio.gather(
+            self.get_chat_session(chat_id, user),
+            cursor.skip(skip).limit(limit).to_list(length=limit),
+            self.messages_collection.count_documents(query)
+        )
+        return message_docs, total
+
+    async def find_previous_user_message(self, chat_id: str, before: datetime) -> Optional[Message]:
+        """Most recent visible user message before a point in the conversation"""
+        doc = await self.messages_collection.find_one(
+            {
+                "chat_session_id": ObjectId(chat_id),
+                "active_visible": True,
+                "role": MessageRole.USER,
+                "timestamp": {"$lt": before}
+            },
+            sort=[("timestamp", -1)]
+        )
+        return Message(**doc) if doc else None
+
     def _extract_legal_categories(self, content: str) -> List[str]:
         """Extract legal categories from message content"""
         categories = []
@@ -703,9 +826,10 @@ class EnhancedChatService:
         user: User, 
         status: Optional[ChatStatus] = None,
         limit: int = 50,
-        skip: int = 0
+        skip: int = 0,
+        after: Optional[Tuple[datetime, ObjectId]] = None
     ) -> List[ChatSession]:
-        """Get user's chat sessions with pagination"""
+        """Get user's chat sessions with pagination (keyset when `after` is given)"""
         
         query = {
             "user_id": user.id,
@@ -715,7 +839,13 @@ class EnhancedChatService:
         if status:
             query["status"] = status
         
-        cursor = self.chat_sessions_collection.find(query).sort("updated_at", -1).skip(skip).limit(limit)
+        if after:
+            query.update(keyset_filter("updated_at", *after, -1))
+        
+        cursor = self.chat_sessions_collection.find(query).sort([("updated_at", -1), ("_id", -1)])
+        if not after:
+            cursor = cursor.skip(skip)
+        cursor = cursor.limit(limit)
         chat_docs = await cursor.to_list(length=limit)
         
         return [ChatSession(**doc) for doc in chat_docs]
@@ -753,6 +883,8 @@ class EnhancedChatService:
                 detail="Failed to update chat session"
             )
         
+        await response_cache.invalidate_user(str(user.id))
+        
         # Return updated chat
         return await self.get_chat_session(chat_id, user)
 
@@ -780,6 +912,7 @@ class EnhancedChatService:
             # Also delete all messages in this chat
             await self.messages_collection.delete_many({"chat_session_id": ObjectId(chat_id)})
         
+        await response_cache.invalidate_user(str(user.id))
         return result.modified_count > 0 or result.deleted_count > 0
 
     async def search_messages(
@@ -788,9 +921,10 @@ class EnhancedChatService:
         query: str,
         chat_id: Optional[str] = None,
         limit: int = 50,
-        skip: int = 0
-    ) -> Tuple[List[Message], int]:
-        """Search messages by content"""
+        skip: int = 0,
+        after: Optional[Tuple[datetime, ObjectId]] = None
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Search messages by content, returning projected documents (keyset pagination when `after` is given)"""
         
         # Build search query
         search_query = {
@@ -805,54 +939,62 @@ class EnhancedChatService:
         total = await self.messages_collection.count_documents(search_query)
         
         # Get messages
-        cursor = self.messages_collection.find(search_query).sort("timestamp", -1).skip(skip).limit(limit)
+        page_query = {**search_query, **keyset_filter("timestamp", *after, -1)} if after else search_query
+        cursor = self.messages_collection.find(page_query, SEARCH_RESULT_PROJECTION).sort([("timestamp", -1), ("_id", -1)])
+        if not after:
+            cursor = cursor.skip(skip)
+        cursor = cursor.limit(limit)
         message_docs = await cursor.to_list(length=limit)
         
-        messages = [Message(**doc) for doc in message_docs]
-        
-        return messages, total
+        return message_docs, total
 
     async def get_chat_statistics(self, user: User) -> Dict[str, Any]:
         """Get user's chat statistics"""
         
-        # Get basic counts
-        total_chats = await self.chat_sessions_collection.count_documents({
-            "user_id": user.id,
-            "status": {"$ne": ChatStatus.DELETED}
-        })
-        
-        active_chats = await self.chat_sessions_collection.count_documents({
-            "user_id": user.id,
-            "status": ChatStatus.ACTIVE
-        })
-        
-        total_messages = await self.messages_collection.count_documents({
-            "user_id": user.id
-        })
-        
-        # Get recent activity
-        recent_activity = await self.messages_collection.count_documents({
-            "user_id": user.id,
-            "timestamp": {"$gte": datetime.utcnow() - timedelta(days=7)}
-        })
+        # One aggregation per collection instead of a query per metric
+        chat_pipeline = [
+            {"$match": {"user_id": user.id, "status": {"$ne": ChatStatus.DELETED}}},
+            {"$facet": {
+                "counts": [
+                    {"$group": {
+                        "_id": None,
+                        "total_chats": {"$sum": 1},
+                        "active_chats": {"$sum": {"$cond": [{"$eq": ["$status", ChatStatus.ACTIVE.value]}, 1, 0]}}
+                    }}
+                ],
+                "legal_categories": [
+                    {"$unwind": "$metadata.legal_categories"},
+                    {"$sortByCount": "$metadata.legal_categories"},
+                    {"$limit": 5}
+                ]
+            }}
+        ]
         
-        # Get most used legal categories
-        pipeline = [
+        message_pipeline = [
             {"$match": {"user_id": user.id}},
-            {"$unwind": "$metadata.legal_categories"},
-            {"$group": {"_id": "$metadata.legal_categories", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}},
-            {"$limit": 5}
+            {"$group": {
+                "_id": None,
+                "total_messages": {"$sum": 1},
+                "recent_activity": {"$sum": {"$cond": [
+                    {"$gte": ["$timestamp", datetime.utcnow() - timedelta(days=7)]}, 1, 0
+                ]}}
+            }}
         ]
         
-        cursor = self.chat_sessions_collection.aggregate(pipeline)
-        legal_categories = await cursor.to_list(length=5)
+        chat_result, message_result = await asyncio.gather(
+            self.chat_sessions_collection.aggregate(chat_pipeline).to_list(length=1),
+            self.messages_collection.aggregate(message_pipeline).to_list(length=1)
+        )
+        
+        chat_facets = chat_result[0] if chat_result else {}
+        chat_counts = chat_facets["counts"][0] if chat_facets.get("counts") else {}
+        message_counts = message_result[0] if message_result else {}
         
         return {
-            "total_chats": total_chats,
-            "active_chats": active_chats,
-            "total_messages": total_messages,
-            "recent_activity": recent_activity,
-            "top_legal_categories": [cat["_id"] for cat in legal_categories],
+            "total_chats": chat_counts.get("total_chats", 0),
+            "active_chats": chat_counts.get("active_chats", 0),
+            "total_messages": message_counts.get("total_messages", 0),
+            "recent_activity": message_counts.get("recent_activity", 0),
+            "top_legal_categories": [cat["_id"] for cat in chat_facets.get("legal_categories", [])],
             "generated_at": datetime.utcnow().isoformat()
         }
\ No newline at end of file
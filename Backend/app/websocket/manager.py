@@ -1,9 +1,10 @@
-import json
 import asyncio
-from typing import Dict, List, Optional, Set
+import orjson
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple, Union
 from fastapi import WebSocket, WebSocketDisconnect
 from datetime import datetime
 import logging
+import uuid
 
 from app.models.user import User
 from app.models.chat import MessageRole
@@ -11,23 +12,241 @@ from app.schemas.websocket import WebSocketMessage, WebSocketResponse
 
 logger = logging.getLogger(__name__)
 
+try:
+    import msgpack
+except ImportError:  # msgpack is optional; every client gets JSON text frames without it
+    msgpack = None
+
+# Typed clients may offer this subprotocol to exchange binary msgpack frames
+MSGPACK_SUBPROTOCOL = "msgpack"
+
+# A recipient that cannot take a frame within this long is treated as gone
+SEND_TIMEOUT_SECONDS = 0.5
+
+# A writer that finds several chunk frames of one stream queued sends them as
+# one frame, up to this many characters of content
+WRITER_COALESCE_MAX_CHARS = 64 * 1024
+CHUNK_FRAME_TYPES = frozenset({"ai_stream_chunk", "ai_response_chunk"})
+
+# Room broadcasts made by one API process reach members connected to the others
+# through this channel prefix (chatbc:{chat_id}); worker events use their own
+BROADCAST_CHANNEL_PREFIX = "chatbc:"
+
+# Frames waiting on one connection's writer; a client this far behind is dropped
+# rather than buffered without bound
+OUTBOUND_QUEUE_SIZE = 256
+
+# Room fan-out yields to the event loop after this many sockets, so a large
+# room does not stall other streams for the whole broadcast
+BROADCAST_BATCH_SIZE = 50
+
+# Backoff between attempts to resubscribe after the Redis relay connection fails
+RELAY_RETRY_MIN_SECONDS = 1.0
+RELAY_RETRY_MAX_SECONDS = 30.0
+
+# AI chunks arriving within this window (or until this many characters) go
+# out as one frame instead of one frame per chunk
+STREAM_COALESCE_SECONDS = 0.03
+STREAM_COALESCE_MAX_CHARS = 512
+
+async def coalesce_chunks(
+    events: AsyncIterator[dict],
+    max_delay: float = STREAM_COALESCE_SECONDS,
+    max_chars: int = STREAM_COALESCE_MAX_CHARS
+) -> AsyncIterator[dict]:
+    """Merge consecutive "chunk" events from an AI stream; other events pass through in order"""
+    loop = asyncio.get_running_loop()
+    iterator = events.__aiter__()
+    buffer: List[str] = []
+    size = 0
+    deadline = 0.0
+    # The pending read is never cancelled by the window timeout, only waited on,
+    # so the underlying generator is not interrupted mid-step
+    pending: Optional[asyncio.Future] = None
+
+    def flush() -> dict:
+        nonlocal buffer, size
+        event = {"type": "chunk", "content": "".join(buffer), "metadata": None}
+        buffer, size = [], 0
+        return event
+
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            timeout = max(0.0, deadline - loop.time()) if buffer else None
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if not done:
+                yield flush()
+                continue
+
+            future, pending = pending, None
+            try:
+                event = future.result()
+            except StopAsyncIteration:
+                break
+
+            if event["type"] == "chunk":
+                if not buffer:
+                    deadline = loop.time() + max_delay
+                buffer.append(event["content"])
+                size += len(event["content"])
+                if size >= max_chars:
+                    yield flush()
+                continue
+
+            if buffer:
+                yield flush()
+            yield event
+
+        if buffer:
+            yield flush()
+    finally:
+        if pending is not None:
+            pending.cancel()
+
+class FrameDecodeError(ValueError):
+    """An incoming frame could not be decoded with the connection's codec"""
+
+def _msgpack_default(obj: Any) -> Any:
+    # Match the JSON encoding: ISO datetimes, everything else (ObjectId, ...) as str
+    return obj.isoformat() if isinstance(obj, datetime) else str(obj)
+
+def _uses_msgpack(websocket: WebSocket) -> bool:
+    return getattr(websocket.state, "subprotocol", None) == MSGPACK_SUBPROTOCOL
+
+class _Frame:
+    """One outgoing message, encoded at most once per codec however many sockets get it"""
+    __slots__ = ("_response", "_data", "_text", "_packed")
+
+    def __init__(
+        self,
+        data: Optional[dict] = None,
+        text: Optional[str] = None,
+        response: Optional[WebSocketResponse] = None
+    ):
+        self._response = response
+        self._data = data
+        self._text = text
+        self._packed: Optional[bytes] = None
+
+    @classmethod
+    def from_response(cls, response: WebSocketResponse) -> "_Frame":
+        return cls(response=response)
+
+    def _fields(self) -> Optional[dict]:
+        """Frame contents as a dict; None for frames that arrived pre-serialized"""
+        if self._data is None and self._response is not None:
+            self._data = self._response.model_dump()
+        return self._data
+
+    def text(self) -> str:
+        if self._text is None:
+            if self._response is not None and self._data is None:
+                # pydantic-core writes JSON straight from the model, no dict in between
+                self._text = self._response.model_dump_json(fallback=str)
+            else:
+                # orjson handles datetimes natively
+                self._text = orjson.dumps(self._data, default=str).decode()
+        return self._text
+
+    def packed(self) -> bytes:
+        if self._packed is None:
+            data = self._fields()
+            if data is None:
+                data = orjson.loads(self._text)
+            self._packed = msgpack.packb(data, default=_msgpack_default)
+        return self._packed
+
+    def chunk_key(self) -> Optional[Tuple[str, Optional[str], Optional[str]]]:
+        """(type, message_id, stream_id) for streamed-chunk frames, None for anything else"""
+        if self._response is not None:
+            frame_type = self._response.type
+        else:
+            frame_type = (self._data or {}).get("type")
+        if frame_type not in CHUNK_FRAME_TYPES:
+            return None
+        data = self._fields()
+        return frame_type, data.get("message_id"), (data.get("metadata") or {}).get("stream_id")
+
+    def content_length(self) -> int:
+        data = self._fields()
+        return len(data.get("content") or "") if data is not None else 0
+
+    def merged_with(self, later: "_Frame") -> Optional["_Frame"]:
+        """One chunk frame carrying both contents, or None if the frames belong to different streams"""
+        key = self.chunk_key()
+        if key is None or key != later.chunk_key():
+            return None
+        earlier_fields, later_fields = self._fields(), later._fields()
+        # The later frame's metadata is the more current (e.g. cumulative full_content)
+        return _Frame(data={
+            **later_fields,
+            "content": (earlier_fields.get("content") or "") + (later_fields.get("content") or "")
+        })
+
+    def send(self, websocket: WebSocket):
+        """Coroutine sending this frame in the socket's negotiated format"""
+        if _uses_msgpack(websocket):
+            return websocket.send_bytes(self.packed())
+        return websocket.send_text(self.text())
+
+def constant_frame(response: WebSocketResponse) -> _Frame:
+    """Frame for a response that never changes; built once at import, its encodings are reused on every send"""
+    return _Frame(data=response.model_dump())
+
+PONG_FRAME = constant_frame(WebSocketResponse(type="pong", content="pong"))
+
+# Every field of a dumped WebSocketResponse, in order, so frames built without
+# the model look the same on the wire
+_RESPONSE_FIELDS = dict.fromkeys(WebSocketResponse.model_fields)
+
+def response_frame(type: str, **fields) -> _Frame:
+    """Frame for a response of plain JSON values, built without a WebSocketResponse instance"""
+    # For per-chunk frames: no model to allocate and later dump back to a dict
+    return _Frame(data={**_RESPONSE_FIELDS, "type": type, **fields})
+
 class ConnectionManager:
     def __init__(self):
         # Active WebSocket connections: {user_id: {connection_id: websocket}}
         self.active_connections: Dict[str, Dict[str, WebSocket]] = {}
         
-        # Chat room memberships: {chat_id: {user_id: connection_id}}
-        self.chat_rooms: Dict[str, Dict[str, str]] = {}
+        # Chat room memberships: {chat_id: {user_id: {connection_id}}}; grouped
+        # by user so excluding a sender skips their sockets without scanning them
+        self.chat_rooms: Dict[str, Dict[str, Set[str]]] = {}
+        
+        # Reverse index for disconnects: {connection_id: {chat_id}}
+        self.connection_rooms: Dict[str, Set[str]] = {}
         
         # User to connection mapping: {connection_id: user_id}
         self.connection_users: Dict[str, str] = {}
         
         # Typing indicators: {chat_id: {user_id: timestamp}}
         self.typing_indicators: Dict[str, Dict[str, datetime]] = {}
+        
+        # Outbound frames per connection, each drained by its own writer task so
+        # senders never wait on a socket: {connection_id: queue}
+        self.out_queues: Dict[str, "asyncio.Queue[_Frame]"] = {}
+        self._writers: Dict[str, asyncio.Task] = {}
+        
+        # Closes of dropped slow connections, referenced until they finish
+        self._closing: Set[asyncio.Task] = set()
+        
+        # Subscription relaying worker-published chat events and other processes'
+        # room broadcasts to local sockets, and the client broadcasts publish on
+        self._relay_task: Optional[asyncio.Task] = None
+        self._redis = None
+        
+        # Tags this process's broadcasts so the relay skips its own
+        self.instance_id = uuid.uuid4().hex
 
     async def connect(self, websocket: WebSocket, user: User, connection_id: str):
-        """Accept a new WebSocket connection"""
-        await websocket.accept()
+        """Accept a new WebSocket connection, negotiating msgpack frames if the client offers them"""
+        if msgpack is not None and MSGPACK_SUBPROTOCOL in websocket.scope.get("subprotocols", []):
+            await websocket.accept(subprotocol=MSGPACK_SUBPROTOCOL)
+            websocket.state.subprotocol = MSGPACK_SUBPROTOCOL
+        else:
+            await websocket.accept()
         
         user_id = str(user.id)
         
@@ -39,6 +258,12 @@ class ConnectionManager:
         self.active_connections[user_id][connection_id] = websocket
         self.connection_users[connection_id] = user_id
         
+        # Everything sent to this socket from now on goes through its writer, in order
+        websocket.state.connection_id = connection_id
+        queue: "asyncio.Queue[_Frame]" = asyncio.Queue(maxsize=OUTBOUND_QUEUE_SIZE)
+        self.out_queues[connection_id] = queue
+        self._writers[connection_id] = asyncio.create_task(self._writer(connection_id, websocket, queue))
+        
         logger.info(f"User {user.email} connected with connection {connection_id}")
         
         # Send connection confirmation
@@ -64,26 +289,26 @@ class ConnectionManager:
             if not self.active_connections[user_id]:
                 del self.active_connections[user_id]
             
-            # Remove from chat rooms
-            for chat_id, members in self.chat_rooms.items():
-                if user_id in members and members[user_id] == connection_id:
-                    del members[user_id]
-            
-            # Clean up empty chat rooms
-            self.chat_rooms = {k: v for k, v in self.chat_rooms.items() if v}
+            # Remove from the chat rooms this connection joined
+            for chat_id in self.connection_rooms.pop(connection_id, ()):
+                self._remove_from_room(chat_id, user_id, connection_id)
             
             # Remove from connection users mapping
             if connection_id in self.connection_users:
                 del self.connection_users[connection_id]
             
+            # Stop the writer; frames still queued for a gone socket are dropped
+            self.out_queues.pop(connection_id, None)
+            writer = self._writers.pop(connection_id, None)
+            if writer is not None and writer is not asyncio.current_task():
+                writer.cancel()
+            
             logger.info(f"User {user_id} disconnected (connection {connection_id})")
 
     async def join_chat_room(self, chat_id: str, user_id: str, connection_id: str):
         """Add user to a chat room"""
-        if chat_id not in self.chat_rooms:
-            self.chat_rooms[chat_id] = {}
-        
-        self.chat_rooms[chat_id][user_id] = connection_id
+        self.chat_rooms.setdefault(chat_id, {}).setdefault(user_id, set()).add(connection_id)
+        self.connection_rooms.setdefault(connection_id, set()).add(chat_id)
         
         # Notify user they joined the room
         websocket = self._get_user_connection(user_id, connection_id)
@@ -99,48 +324,293 @@ class ConnectionManager:
 
     async def leave_chat_room(self, chat_id: str, user_id: str):
         """Remove user from a chat room"""
-        if chat_id in self.chat_rooms and user_id in self.chat_rooms[chat_id]:
-            del self.chat_rooms[chat_id][user_id]
-            
-            # Clean up empty chat room
-            if not self.chat_rooms[chat_id]:
-                del self.chat_rooms[chat_id]
+        for connection_id in list(self.chat_rooms.get(chat_id, {}).get(user_id, ())):
+            self.connection_rooms.get(connection_id, set()).discard(chat_id)
+            self._remove_from_room(chat_id, user_id, connection_id)
+
+    def _remove_from_room(self, chat_id: str, user_id: str, connection_id: str):
+        """Drop one connection from a room, pruning empty entries"""
+        members = self.chat_rooms.get(chat_id)
+        if not members or user_id not in members:
+            return
+        
+        members[user_id].discard(connection_id)
+        if not members[user_id]:
+            del members[user_id]
+        
+        # Clean up empty chat room
+        if not members:
+            del self.chat_rooms[chat_id]
+
+    async def receive(self, websocket: WebSocket) -> dict:
+        """Read and decode the next client message in the socket's negotiated format"""
+        # The raw ASGI message, so the payload is parsed exactly as it arrived:
+        # no str -> bytes (or bytes -> str) conversion before the decoder
+        frame = await websocket.receive()
+        if frame["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(frame.get("code", 1000), frame.get("reason"))
+        text, data = frame.get("text"), frame.get("bytes")
+        
+        if _uses_msgpack(websocket):
+            if data is None:
+                raise FrameDecodeError("Expected a binary msgpack frame")
+            try:
+                message = msgpack.unpackb(data)
+            except Exception as e:
+                raise FrameDecodeError("Invalid msgpack message format") from e
+        else:
+            # JSON may arrive in text or binary frames; orjson parses either
+            try:
+                message = orjson.loads(text if text is not None else data or b"")
+            except orjson.JSONDecodeError as e:
+                raise FrameDecodeError("Invalid JSON message format") from e
+
+        if not isinstance(message, dict):
+            raise FrameDecodeError("Message must be an object")
+        return message
+
+    async def _writer(self, connection_id: str, websocket: WebSocket, queue: "asyncio.Queue[_Frame]"):
+        """Drain one connection's outbound queue; a failed or stalled send drops the connection"""
+        # A frame taken off the queue that could not be merged into the previous one
+        pending: Optional[_Frame] = None
+        try:
+            while True:
+                frame = pending if pending is not None else await queue.get()
+                pending = None
+                
+                # A client that has fallen behind gets its backlog of chunks for a
+                # stream as one frame; start/complete/error frames are never merged
+                while (
+                    not queue.empty()
+                    and frame.chunk_key() is not None
+                    and frame.content_length() < WRITER_COALESCE_MAX_CHARS
+                ):
+                    following = queue.get_nowait()
+                    merged = frame.merged_with(following)
+                    if merged is None:
+                        pending = following
+                        break
+                    frame = merged
+                
+                await asyncio.wait_for(frame.send(websocket), SEND_TIMEOUT_SECONDS)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            logger.warning(f"Send to connection {connection_id} stalled; dropping it")
+            # 1013: try again later
+            self._drop(connection_id, websocket, 1013, "Client too slow")
+        except Exception as e:
+            logger.error(f"Error sending to connection {connection_id}: {e!r}")
+            # 1011: server error; a cut-off frame may have been partly written
+            self._drop(connection_id, websocket, 1011, "Send failed")
+
+    def _enqueue(self, connection_id: str, frame: _Frame) -> bool:
+        """Hand a frame to a connection's writer without waiting; False if it has none"""
+        queue = self.out_queues.get(connection_id)
+        if queue is None:
+            return False
+        
+        try:
+            queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            logger.warning(f"Connection {connection_id} fell {OUTBOUND_QUEUE_SIZE} frames behind; dropping it")
+            user_id = self.connection_users.get(connection_id)
+            websocket = self._get_user_connection(user_id, connection_id) if user_id else None
+            # 1013: try again later
+            self._drop(connection_id, websocket, 1013, "Client too slow")
+        return True
+
+    def _drop(self, connection_id: str, websocket: Optional[WebSocket], code: int, reason: str):
+        """Unregister a connection and close its socket, so the client reconnects instead of missing broadcasts"""
+        self.disconnect(connection_id)
+        if websocket is not None:
+            task = asyncio.create_task(self._close_quietly(websocket, code, reason))
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+
+    async def _close_quietly(self, websocket: WebSocket, code: int, reason: str):
+        try:
+            await websocket.close(code=code, reason=reason)
+        except Exception:
+            pass
 
     async def send_to_connection(self, websocket: WebSocket, response: WebSocketResponse):
         """Send message to a specific WebSocket connection"""
+        await self.send_frame(websocket, _Frame.from_response(response))
+
+    async def send_frame(self, websocket: WebSocket, frame: _Frame):
+        """Send an already built frame (e.g. a constant_frame) to a specific WebSocket connection"""
+        connection_id = getattr(websocket.state, "connection_id", None)
+        if connection_id is not None:
+            # Once registered, frames only go through the writer; a dropped
+            # connection gets nothing more, not a direct send after a cut-off frame
+            self._enqueue(connection_id, frame)
+            return
+        
+        # Not registered yet, e.g. errors sent around the handshake
         try:
-            await websocket.send_text(response.json())
+            await frame.send(websocket)
         except Exception as e:
             logger.error(f"Error sending message to connection: {e}")
 
     async def send_to_user(self, user_id: str, response: WebSocketResponse):
         """Send message to all connections of a user"""
         if user_id in self.active_connections:
-            disconnected_connections = []
-            
-            for connection_id, websocket in self.active_connections[user_id].items():
-                try:
-                    await websocket.send_text(response.json())
-                except Exception as e:
-                    logger.error(f"Error sending to user {user_id}, connection {connection_id}: {e}")
-                    disconnected_connections.append(connection_id)
+            frame = _Frame.from_response(response)
             
-            # Clean up disconnected connections
-            for connection_id in disconnected_connections:
-                self.disconnect(connection_id)
+            # Copied: an overflowing connection is disconnected while we iterate
+            for connection_id in list(self.active_connections[user_id]):
+                self._enqueue(connection_id, frame)
 
-    async def broadcast_to_chat(self, chat_id: str, response: WebSocketResponse, exclude_user: Optional[str] = None):
-        """Broadcast message to all users in a chat room"""
-        if chat_id not in self.chat_rooms:
+    async def broadcast_to_chat(
+        self,
+        chat_id: str,
+        response: Union[WebSocketResponse, _Frame],
+        exclude_user: Optional[str] = None
+    ):
+        """Broadcast message to all users in a chat room, on every API process"""
+        frame = response if isinstance(response, _Frame) else _Frame.from_response(response)
+        if self._redis is not None:
+            await self._publish(chat_id, frame, exclude_user)
+        
+        targets = self._room_targets(chat_id, exclude_user)
+        if not targets:
+            # Typically a single-user chat excluding its sender: nothing to encode
             return
         
-        for user_id, connection_id in self.chat_rooms[chat_id].items():
+        # Local members are served directly; encoded once per format in use and
+        # recipients share the encoded frame
+        await self._enqueue_all(targets, frame)
+
+    async def _publish(self, chat_id: str, frame: _Frame, exclude_user: Optional[str]):
+        """Hand a room broadcast to the other API processes"""
+        envelope = {"origin": self.instance_id, "exclude": exclude_user}
+        fields = frame._fields()
+        if fields is not None:
+            envelope["frame"] = fields
+        else:
+            # Pre-serialized payloads travel as the text they arrived as
+            envelope["text"] = frame.text()
+        try:
+            await self._redis.publish(f"{BROADCAST_CHANNEL_PREFIX}{chat_id}", orjson.dumps(envelope, default=str))
+        except Exception as e:
+            logger.error(f"Error publishing broadcast for chat {chat_id}: {e}")
+
+    async def _deliver_published(self, chat_id: str, payload: Union[bytes, str]):
+        """Deliver another process's room broadcast to this process's members"""
+        envelope = orjson.loads(payload)
+        if envelope["origin"] == self.instance_id:
+            return
+        
+        targets = self._room_targets(chat_id, envelope.get("exclude"))
+        if targets:
+            frame = _Frame(data=envelope["frame"]) if "frame" in envelope else _Frame(text=envelope["text"])
+            await self._enqueue_all(targets, frame)
+
+    async def broadcast_raw(self, chat_id: str, payload: Union[bytes, str], exclude_user: Optional[str] = None):
+        """Broadcast a pre-serialized JSON payload to all users in a chat room, on every API process"""
+        # Decode once; msgpack recipients share one re-encoding of it
+        frame = _Frame(text=payload.decode() if isinstance(payload, bytes) else payload)
+        if self._redis is not None:
+            await self._publish(chat_id, frame, exclude_user)
+        await self._deliver_raw(chat_id, frame, exclude_user)
+
+    async def _deliver_raw(self, chat_id: str, frame: _Frame, exclude_user: Optional[str] = None):
+        """Deliver a pre-serialized payload to this process's room members"""
+        targets = self._room_targets(chat_id, exclude_user)
+        if targets:
+            await self._enqueue_all(targets, frame)
+
+    def _room_targets(self, chat_id: str, exclude_user: Optional[str]) -> List[Tuple[str, str, WebSocket]]:
+        """(user_id, connection_id, websocket) for every live socket in a room"""
+        targets = []
+        for user_id, connection_ids in self.chat_rooms.get(chat_id, {}).items():
             if exclude_user and user_id == exclude_user:
                 continue
             
-            websocket = self._get_user_connection(user_id, connection_id)
-            if websocket:
-                await self.send_to_connection(websocket, response)
+            user_connections = self.active_connections.get(user_id, {})
+            for connection_id in connection_ids:
+                websocket = user_connections.get(connection_id)
+                if websocket:
+                    targets.append((user_id, connection_id, websocket))
+        return targets
+
+    async def _enqueue_all(self, targets: List[Tuple[str, str, WebSocket]], frame: _Frame):
+        """Queue one frame for every target; slow sockets are dropped by their own writer"""
+        # Each target gets the frame once, so yielding between batches keeps
+        # per-client order; small rooms never yield
+        for start in range(0, len(targets), BROADCAST_BATCH_SIZE):
+            if start:
+                await asyncio.sleep(0)
+            for _, connection_id, _ in targets[start:start + BROADCAST_BATCH_SIZE]:
+                self._enqueue(connection_id, frame)
+
+    async def relay_chat_events(self, client, channel_prefix: str):
+        """Fan out chat events published to Redis (by AI workers and other API processes) to this process's sockets"""
+        delay = RELAY_RETRY_MIN_SECONDS
+        while True:
+            pubsub = client.pubsub()
+            try:
+                await pubsub.psubscribe(f"{channel_prefix}*", f"{BROADCAST_CHANNEL_PREFIX}*")
+                delay = RELAY_RETRY_MIN_SECONDS
+                await self._relay_messages(pubsub, channel_prefix)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Redis restarted or the connection dropped; without resubscribing
+                # this process would stop receiving worker and cross-process events
+                logger.error(f"Chat event relay failed, resubscribing in {delay:.0f}s: {e!r}")
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+            
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RELAY_RETRY_MAX_SECONDS)
+
+    async def _relay_messages(self, pubsub, channel_prefix: str):
+        """Deliver messages from one subscription until its connection fails"""
+        async for message in pubsub.listen():
+            if message["type"] != "pmessage":
+                continue
+            channel = message["channel"]
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            try:
+                if channel.startswith(BROADCAST_CHANNEL_PREFIX):
+                    await self._deliver_published(channel[len(BROADCAST_CHANNEL_PREFIX):], message["data"])
+                else:
+                    # Worker events reach every API process through this
+                    # channel already, so they are not published again
+                    data = message["data"]
+                    await self._deliver_raw(
+                        channel[len(channel_prefix):],
+                        _Frame(text=data.decode() if isinstance(data, bytes) else data)
+                    )
+            except Exception as e:
+                logger.error(f"Error relaying event on {channel}: {e}")
+
+    def start_relay(self, client, channel_prefix: str):
+        """Subscribe once per process to published chat events, and publish room broadcasts from now on"""
+        if self._relay_task is None:
+            self._redis = client
+            self._relay_task = asyncio.create_task(self.relay_chat_events(client, channel_prefix))
+
+    async def stop_relay(self):
+        """Stop relaying published chat events"""
+        self._redis = None
+        if self._relay_task is None:
+            return
+        self._relay_task.cancel()
+        try:
+            await self._relay_task
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            # Shutdown goes on even if the relay had died
+            logger.error(f"Chat event relay ended with an error: {e!r}")
+        self._relay_task = None
 
     async def handle_typing_indicator(self, chat_id: str, user_id: str, is_typing: bool):
         """Handle typing indicators"""
@@ -177,16 +647,16 @@ class ConnectionManager:
         full_content = ""
         
         try:
-            async for chunk_data in content_generator:
+            async for chunk_data in coalesce_chunks(content_generator):
                 if chunk_data["type"] == "chunk":
                     chunk_text = chunk_data["content"]
                     full_content += chunk_text
                     
-                    # Broadcast chunk to chat room
+                    # Broadcast chunk to chat room; per-chunk frames skip the model
                     await self.broadcast_to_chat(
                         chat_id,
-                        WebSocketResponse(
-                            type="ai_response_chunk",
+                        response_frame(
+                            "ai_response_chunk",
                             content=chunk_text,
                             message_id=message_id,
                             metadata={
@@ -207,7 +677,7 @@ class ConnectionManager:
                             message_id=message_id,
                             metadata={
                                 "chat_id": chat_id,
-                                "ai_metadata": chunk_data["metadata"].dict() if chunk_data["metadata"] else None,
+                                "ai_metadata": chunk_data["metadata"],
                                 "is_streaming": False
                             }
                         )
@@ -320,13 +790,11 @@ class WebSocketHandler:
                     
             elif ws_message.type == "ping":
                 # Respond to ping with pong
-                await self.connection_manager.send_to_connection(
-                    websocket,
-                    WebSocketResponse(type="pong", content="pong")
-                )
+                await self.connection_manager.send_frame(websocket, PONG_FRAME)
                 
             else:
-                logger.warning(f"Unknown message type: {ws_message.type}")
+                # Client-controlled and per frame, so formatted lazily
+                logger.warning("Unknown message type: %s", ws_message.type)
                 
         except Exception as e:
             logger.error(f"Error handling WebSocket message: {e}")
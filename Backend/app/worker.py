@@ -0,0 +1,70 @@
+# arq worker for AI generation. Run with: arq app.worker.WorkerSettings
+from typing import Union
+import logging
+
+from app.core.database import connect_to_mongo, close_mongo_connection, get_database
+from app.core.redis import connect_to_redis, close_redis_connection
+from app.core.task_queue import CHAT_EVENTS_CHANNEL_PREFIX, redis_settings
+from app.models.chat import ResponseFormat
+from app.services.auth_service import AuthService
+from app.services.chat_service import EnhancedChatService
+from app.services.ai_service import AIService
+from app.services import ai_tasks
+
+logger = logging.getLogger(__name__)
+
+async def startup(ctx):
+    """Open the worker's own Mongo client and build its services"""
+    await connect_to_mongo()
+    # Shared Redis client so completed jobs invalidate cached chat responses
+    await connect_to_redis()
+    db = get_database()
+    ctx["auth_service"] = AuthService(db)
+    ctx["chat_service"] = EnhancedChatService(db)
+    ctx["ai_service"] = AIService(db)
+
+    async def publish(chat_id: str, payload: Union[bytes, str]):
+        # API processes relay these to their WebSocket clients
+        await ctx["redis"].publish(f"{CHAT_EVENTS_CHANNEL_PREFIX}{chat_id}", payload)
+
+    ctx["publish"] = publish
+
+async def shutdown(ctx):
+    await close_redis_connection()
+    await close_mongo_connection()
+
+async def generate_ai_response_task(
+    ctx,
+    chat_id: str,
+    user_message: str,
+    user_id: str,
+    response_format: str,
+    regenerate: bool
+):
+    """Queued counterpart of ai_tasks.generate_ai_response"""
+    user = await ctx["auth_service"].get_user_by_id(user_id)
+    await ai_tasks.generate_ai_response(
+        chat_id, user_message, user, ctx["chat_service"], ctx["ai_service"],
+        ResponseFormat(response_format), regenerate, ctx["publish"]
+    )
+
+async def regenerate_ai_response_task(
+    ctx,
+    chat_id: str,
+    user_message: str,
+    user_id: str,
+    stream_id: str,
+    response_format: str
+):
+    """Queued counterpart of ai_tasks.regenerate_ai_response"""
+    user = await ctx["auth_service"].get_user_by_id(user_id)
+    await ai_tasks.regenerate_ai_response(
+        chat_id, user_message, user, ctx["chat_service"], ctx["ai_service"],
+        stream_id, ResponseFormat(response_format)
+    )
+
+class WorkerSettings:
+    functions = [generate_ai_response_task, regenerate_ai_response_task]
+    on_startup = startup
+    on_shutdown = shutdown
+    redis_settings = redis_settings()
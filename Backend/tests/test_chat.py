@@ -58,7 +58,16 @@ class TestChatManagement:
         assert len(data["chat_sessions"]) >= 2
         assert data["total"] >= 2
         assert data["page"] == 1
-    
+
+    async def test_cached_route_keeps_rate_limit_headers(self, client: AsyncClient, authenticated_user: dict):
+        """Test rate limit headers are sent on both a cache miss and a cache hit"""
+        for _ in range(2):
+            response = await client.get("/api/v1/chats/", headers=authenticated_user["headers"])
+
+            assert response.status_code == 200
+            assert "X-RateLimit-Limit" in response.headers
+            assert "X-RateLimit-Remaining" in response.headers
+
     async def test_get_chat_history_pagination(self, client: AsyncClient, authenticated_user: dict):
         """Test chat history pagination"""
         # Create multiple chat sessions
@@ -0,0 +1,61 @@
+# tests/test_rate_limit.py
+from app.core.rate_limit import RateLimiter
+
+class TestLocalRateLimiter:
+    """Test in-process token bucket rate limiter"""
+
+    def test_allows_up_to_limit(self):
+        """Test requests are allowed until the limit is reached"""
+        limiter = RateLimiter()
+
+        for _ in range(5):
+            assert limiter.is_allowed("user", 5, 60) is True
+        assert limiter.is_allowed("user", 5, 60) is False
+
+    def test_keys_are_independent(self):
+        """Test limits are tracked per key"""
+        limiter = RateLimiter()
+
+        assert limiter.is_allowed("a", 1, 60) is True
+        assert limiter.is_allowed("a", 1, 60) is False
+        assert limiter.is_allowed("b", 1, 60) is True
+
+    def test_state_is_bounded(self):
+        """Test least recently used keys are evicted"""
+        limiter = RateLimiter(max_keys=3)
+
+        for i in range(10):
+            limiter.is_allowed(f"user_{i}", 10, 60)
+
+        assert len(limiter.state) == 3
+        assert "user_9" in limiter.state
+        assert "user_0" not in limiter.state
+
+    def test_allowed_requests_are_queued_for_sync(self):
+        """Test allowed requests accumulate until drained for reconciliation"""
+        limiter = RateLimiter()
+
+        for _ in range(3):
+            limiter.is_allowed("user", 2, 60)
+
+        assert limiter.drain_pending() == {"user": (2, 2, 60)}
+        assert limiter.drain_pending() == {}
+
+    def test_global_count_caps_local_bucket(self):
+        """Test the cluster-wide count drains a worker's remaining tokens"""
+        limiter = RateLimiter()
+
+        assert limiter.is_allowed("user", 5, 60) is True
+        limiter.apply_global("user", 5, 60, 5)
+
+        assert limiter.is_allowed("user", 5, 60) is False
+
+    def test_remaining_counts_down(self):
+        """Test remaining reports whole tokens left after each request"""
+        limiter = RateLimiter()
+
+        assert limiter.remaining("user", 60) == 0
+        limiter.is_allowed("user", 3, 60)
+        assert limiter.remaining("user", 60) == 2
+        limiter.is_allowed("user", 3, 60)
+        assert limiter.remaining("user", 60) == 1
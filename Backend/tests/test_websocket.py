@@ -1,9 +1,13 @@
 # tests/test_websocket.py
 import pytest
 import json
+import asyncio
+from types import SimpleNamespace
 from httpx import AsyncClient
 from fastapi.testclient import TestClient
 from app.main import app
+from app.schemas.websocket import WebSocketResponse
+from app.websocket.manager import ConnectionManager, _Frame, response_frame
 
 class TestWebSocket:
     """Test WebSocket functionality"""
@@ -43,3 +47,53 @@ class TestWebSocket:
             echo_message = json.loads(response)
             assert echo_message["type"] == "echo"
             assert echo_message["original_message"] == test_message
+
+class _RecordingSocket:
+    """Stand-in WebSocket that records the text frames written to it"""
+
+    def __init__(self):
+        self.state = SimpleNamespace()
+        self.sent = []
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+class TestConnectionWriter:
+    """Test the per-connection outbound writer"""
+
+    async def test_queued_chunks_are_coalesced(self):
+        """Test backlogged chunk frames of one stream go out as one frame, in order"""
+        manager = ConnectionManager()
+        websocket = _RecordingSocket()
+        queue = asyncio.Queue()
+
+        def chunk(content, stream_id="s1"):
+            return WebSocketResponse(
+                type="ai_stream_chunk", content=content, message_id="m1",
+                metadata={"stream_id": stream_id, "is_streaming": True}
+            )
+
+        for response in [
+            chunk("Hel"), chunk("lo"), chunk("!", stream_id="s2"),
+            WebSocketResponse(type="ai_stream_complete", message_id="m1")
+        ]:
+            queue.put_nowait(_Frame.from_response(response))
+
+        writer = asyncio.create_task(manager._writer("c1", websocket, queue))
+        while len(websocket.sent) < 3:
+            await asyncio.sleep(0)
+        writer.cancel()
+
+        assert [frame["content"] for frame in websocket.sent] == ["Hello", "!", None]
+        assert websocket.sent[2]["type"] == "ai_stream_complete"
+
+class TestFrames:
+    """Test outbound frame encoding"""
+
+    def test_response_frame_matches_model(self):
+        """Test a frame built without the model encodes like the model"""
+        fields = dict(content="Hi", message_id="m1", metadata={"stream_id": "s1", "is_streaming": True})
+
+        frame = response_frame("ai_stream_chunk", **fields)
+
+        assert json.loads(frame.text()) == WebSocketResponse(type="ai_stream_chunk", **fields).model_dump()